@@ -1,7 +1,11 @@
 from __future__ import annotations
 
-import csv
+import base64
+import binascii
+import hashlib
 import hmac
+import json
+import mimetypes
 import os
 import shutil
 import uuid
@@ -10,10 +14,15 @@ from pathlib import Path
 from typing import List, Dict, Optional
 from urllib.parse import quote
 
+import click
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
 from flask import (
     Flask,
+    Response,
     abort,
     flash,
+    jsonify,
     redirect,
     render_template,
     request,
@@ -22,7 +31,24 @@ from flask import (
     session,
     url_for,
 )
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
+from werkzeug.utils import send_from_directory as _wz_send_from_directory
+
+import compress
+import export
+import importer
+import migrations
+import thumbs
+import upload_stream
+from cache import PageCache
+from jobs import JobQueue, run_worker
+from store import CsvStore, SchemaError, open_store
+
+try:
+    import orjson
+except ImportError:  # без orjson — стандартный json
+    orjson = None
 
 # ----------------------------
 # Paths (Render Disk ready)
@@ -37,6 +63,9 @@ UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
 
 SUBMISSIONS_CSV = DATA_DIR / "submissions.csv"
 
+# csv (по умолчанию) | sqlite -> DATA_DIR/submissions.sqlite3
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "csv").strip().lower()
+
 # ----------------------------
 # Upload policy
 # ----------------------------
@@ -45,6 +74,20 @@ MAX_FILES = int(os.environ.get("MAX_FILES", "5"))
 MAX_TOTAL_MB = int(os.environ.get("MAX_TOTAL_MB", "25"))  # whole request cap
 MAX_FILE_MB = int(os.environ.get("MAX_FILE_MB", "10"))    # per photo cap
 
+# Отдача фото фронт-прокси: "" (сам Flask) | accel (nginx X-Accel-Redirect)
+# | sendfile (X-Sendfile: Apache/lighttpd). См. nginx.conf.example
+SENDFILE_MODE = os.environ.get("SENDFILE_MODE", "").strip().lower()
+ACCEL_PREFIX = "/" + os.environ.get("ACCEL_PREFIX", "/_protected/uploads/").strip("/") + "/"
+
+# версионированные ссылки на фото (?v=) кэшируются на год
+PHOTO_MAX_AGE = 365 * 24 * 3600
+
+# сжатие текстовых ответов (0 — выключить, если жмёт фронт-прокси)
+COMPRESS = os.environ.get("COMPRESS", "1") == "1"
+
+# карточек на первой странице / в одном ответе /api/listings
+PAGE_SIZE = int(os.environ.get("PAGE_SIZE", os.environ.get("MAX_LISTINGS", "30")))
+
 app = Flask(__name__, static_folder="static", static_url_path="/static")
 
 @app.template_filter('is_numeric')
@@ -63,6 +106,27 @@ def is_numeric_filter(value) -> bool:
 app.secret_key = os.environ.get("SECRET_KEY", "dev-secret-change-me")
 app.config["MAX_CONTENT_LENGTH"] = MAX_TOTAL_MB * 1024 * 1024
 
+# файлы из multipart пишутся сразу в UPLOADS_DIR/_incoming (тот же диск),
+# лимит MAX_FILE_MB и сигнатура картинки проверяются по ходу чтения
+app.request_class = upload_stream.StagingRequest
+app.config["UPLOAD_STAGING_DIR"] = UPLOADS_DIR / upload_stream.STAGING_DIR
+app.config["MAX_FILE_SIZE"] = MAX_FILE_MB * 1024 * 1024
+
+# массовый импорт (/admin/import): архив с фото на тысячи карточек в общие
+# лимиты не влезает — свой потолок на запрос и на файл (IMPORT_MAX_MB)
+IMPORT_MAX_MB = int(os.environ.get("IMPORT_MAX_MB", "1024"))
+app.config["UPLOAD_LIMITS"] = {
+    "admin_import_post": (IMPORT_MAX_MB * 1024 * 1024, IMPORT_MAX_MB * 1024 * 1024),
+}
+
+# JINJA_BYTECODE_CACHE=1: скомпилированные шаблоны в DATA_DIR/.jinja-cache,
+# новые воркеры/деплои не компилируют их заново (ключ — имя + хэш исходника)
+if os.environ.get("JINJA_BYTECODE_CACHE", "0") == "1":
+    (DATA_DIR / ".jinja-cache").mkdir(exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(str(DATA_DIR / ".jinja-cache"))
+(UPLOADS_DIR / upload_stream.STAGING_DIR).mkdir(exist_ok=True)
+upload_stream.sweep_staging(UPLOADS_DIR / upload_stream.STAGING_DIR)
+
 
 # ----------------------------
 # Helpers
@@ -96,45 +160,59 @@ def _csv_columns() -> list[str]:
     ]
 
 
-def _ensure_csv_header() -> None:
-    """Ensure CSV exists with the expected header.
-    If file exists but header is missing 'password', do a simple migration.
-    """
-    if not SUBMISSIONS_CSV.exists():
-        with SUBMISSIONS_CSV.open("w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerow(_csv_columns())
-        return
+# CSV парсится один раз на процесс, дальше — инкрементально по mtime/size.
+# INDEX_SIDECAR=1 — хранить индекс id -> смещение рядом с CSV (submissions.idx)
+# CSV_JOURNAL=1 — правки/удаления дописываются в submissions.journal,
+# основной файл пересобирается после CSV_COMPACT_AT записей
+_csv_opts = {}
+if STORAGE_BACKEND == "csv":
+    _csv_opts = {
+        "sidecar": os.environ.get("INDEX_SIDECAR", "0") == "1",
+        "journal": os.environ.get("CSV_JOURNAL", "0") == "1",
+        "compact_at": int(os.environ.get("CSV_COMPACT_AT", "500")),
+    }
+_store = open_store(STORAGE_BACKEND, DATA_DIR, _csv_columns(), **_csv_opts)
 
-    # Migration: add missing columns to existing CSV (most importantly 'password')
-    with SUBMISSIONS_CSV.open("r", encoding="utf-8", newline="") as f:
-        reader = csv.reader(f)
-        rows = list(reader)
+# Обработка фото после загрузки: JOB_QUEUE=1 — задачи в DATA_DIR/jobs.sqlite3,
+# их выполняет отдельный процесс `flask --app app jobs-worker`; иначе — в запросе
+JOB_QUEUE = os.environ.get("JOB_QUEUE", "0") == "1"
+_jobs = JobQueue(DATA_DIR / "jobs.sqlite3") if JOB_QUEUE else None
 
-    if not rows:
-        with SUBMISSIONS_CSV.open("w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerow(_csv_columns())
-        return
 
-    header = rows[0]
-    expected = _csv_columns()
+# Версия схемы submissions.csv: применённые миграции (migrations.py) записаны
+# в DATA_DIR/schema_version, при старте догоняем до последней
+SCHEMA_VERSION_FILE = DATA_DIR / "schema_version"
 
-    if header == expected:
-        return
 
-    if "password" not in header:
-        new_header = header + ["password"]
-        new_rows = [new_header]
-        for r in rows[1:]:
-            new_rows.append(r + [""])
-        with SUBMISSIONS_CSV.open("w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerows(new_rows)
-        return
+def _migration_plan(force: bool = False) -> migrations.Plan:
+    return migrations.plan(
+        SUBMISSIONS_CSV, _csv_columns(), SCHEMA_VERSION_FILE,
+        journal_path=_store.journal_path, force=force,
+    )
+
+
+def _migrate_schema(force: bool = False, drop_unknown: bool = False) -> int:
+    """Apply pending migrations; ``force`` re-runs all of them (they are idempotent)."""
+    with _store.lock:
+        plan = _migration_plan(force)
+        n = plan.apply(drop_unknown=drop_unknown)
+        if plan.files:
+            _store.invalidate()
+    return n
 
-    # If header differs in other ways, keep it as-is (avoid data loss).
-    return
+
+def _append_rows(rows: list[dict]) -> None:
+    """Append new cards; a CSV with an older header is migrated first."""
+    with _store.lock:
+        try:
+            _store.append_many(rows)
+        except SchemaError:
+            if STORAGE_BACKEND != "csv":
+                raise
+            # файл подменили (например, восстановили старую копию) — догоняем
+            # схему; неизвестные колонки — MigrationError, без записи
+            _migrate_schema(force=True)
+            _store.append_many(rows)
 
 
 def _save_submission_row(
@@ -148,53 +226,155 @@ def _save_submission_row(
     photos: List[str],
     password: str = "",
 ):
-    _ensure_csv_header()
-    with SUBMISSIONS_CSV.open("a", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow([
-            sid,
-            created_utc,
-            kind,
-            title,
-            price_tenge,
-            phone,
-            description,
-            ";".join(photos),
-            password,
-        ])
+    row = {
+        "id": sid,
+        "created_utc": created_utc,
+        "kind": kind,
+        "title": title,
+        "price_tenge": price_tenge,
+        "phone": phone,
+        "description": description,
+        "photos": ";".join(photos),
+        "password": password,
+    }
+    _append_rows([row])
+
+
+if STORAGE_BACKEND == "csv":
+    try:
+        _migrate_schema()
+    except migrations.MigrationError as e:
+        # чтение работает и со старым заголовком, а запись до миграции
+        # откажет (SchemaError) — не роняем старт (и `flask migrate`)
+        app.logger.error("schema migration skipped: %s", e)
+
+
+# Кэш отрендеренной главной: ключ — её ETag (версия данных, разблокированные карточки).
+# Версия меняется при любой записи (в т.ч. из других воркеров), а админские
+# роуты дополнительно чистят кэш сразу — см. _data_changed()
+_page_cache = PageCache(max_bytes=int(float(os.environ.get("PAGE_CACHE_MB", "8")) * 1024 * 1024))
+
+# Отрендеренные карточки (_card.html): ключ — id, хэш полей карточки (в т.ч.
+# unlocked и ссылок с ?v=) и mtime папки с файлами. Изменённая карточка получает
+# новый ключ, остальные берутся из кэша; старые записи вытесняет LRU
+_card_cache = PageCache(max_bytes=int(float(os.environ.get("CARD_CACHE_MB", "4")) * 1024 * 1024))
+
+
+# шаблоны входят в ETag: после деплоя с новой вёрсткой старые 304 не отдаём
+_TEMPLATES_VERSION = max(
+    (p.stat().st_mtime_ns for p in (BASE_DIR / "templates").rglob("*.html")),
+    default=0,
+)
+
+
+def _listing_etag(*parts) -> str:
+    """Strong ETag for listing responses: data version + this session's unlocks."""
+    unlocked = tuple(sorted(session.get("unlocked_cards", []) or []))
+    # сжатое и несжатое тело — разные представления, у них разные ETag
+    encoding = compress.best_encoding(request.accept_encodings) if COMPRESS else None
+    raw = repr((_store.version, unlocked, _TEMPLATES_VERSION, encoding) + parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _not_modified(etag: str) -> Optional[Response]:
+    if not request.if_none_match.contains(etag):
+        return None
+    resp = Response(status=304)
+    return _listing_headers(resp, etag)
+
+
+def _listing_headers(resp: Response, etag: str) -> Response:
+    resp.set_etag(etag)
+    lm = _store.last_modified
+    if lm is not None:
+        resp.last_modified = datetime.fromtimestamp(lm, timezone.utc)
+    # страница зависит от сессии: только браузерный кэш, с ревалидацией
+    resp.headers["Cache-Control"] = "private, no-cache"
+    resp.vary.add("Cookie")
+    return resp
+
+
+@app.after_request
+def _compress_response(resp: Response) -> Response:
+    # gzip/brotli/zstd для текстовых ответов; картинки и т.п. как есть
+    if not COMPRESS or not compress.compressible(resp.mimetype):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    if (
+        resp.status_code != 200
+        or "Content-Encoding" in resp.headers
+        or "X-Accel-Redirect" in resp.headers
+        or "X-Sendfile" in resp.headers
+    ):
+        return resp
+    encoding = compress.best_encoding(request.accept_encodings)
+    if encoding is None:
+        return resp
+
+    if resp.direct_passthrough or resp.is_streamed:
+        # файлы и генераторы (CSV-выгрузка): сжимаем по кускам, не читая целиком
+        if resp.content_length is not None and resp.content_length < compress.MIN_SIZE:
+            return resp
+        resp.response = compress.encode_stream(resp.response, encoding)
+        resp.direct_passthrough = False
+        resp.headers.pop("Content-Length", None)
+        resp.headers.pop("Accept-Ranges", None)
+        etag, weak = resp.get_etag()
+        if etag and not weak:
+            resp.set_etag(etag, weak=True)
+    else:
+        body = resp.get_data()
+        if len(body) < compress.MIN_SIZE:
+            return resp
+        # ответы с ETag (главная, /api/listings) — сжатое тело кэшируем рядом
+        # с несжатым, чтобы не сжимать одно и то же на каждом запросе
+        etag = resp.get_etag()[0]
+        key = ("compressed", etag, encoding) if etag else None
+        data = _page_cache.get(key) if key else None
+        if data is None:
+            data = compress.encode(body, encoding)
+            if key:
+                _page_cache.put(key, data)
+        resp.set_data(data)
+    resp.headers["Content-Encoding"] = encoding
+    return resp
+
+
+def _data_changed() -> None:
+    """Drop derived caches after an admin write."""
+    _page_cache.clear()
+
+
+def _process_photo(sid: str, filename: str) -> None:
+    # превью сразу в запросе или задачей для воркера (см. JOB_QUEUE)
+    if _jobs is not None and thumbs.is_image(filename):
+        _jobs.enqueue("thumbs", sid, filename=filename)
+    else:
+        thumbs.make_thumbs(UPLOADS_DIR / sid, filename)
+
+
+def _job_thumbs(sid: str, filename: str) -> None:
+    card_dir = UPLOADS_DIR / sid
+    if not (card_dir / filename).is_file():
+        return  # фото или карточку уже удалили
+    if not thumbs.AVAILABLE:
+        raise RuntimeError("Pillow is not installed")
+    thumbs.make_thumbs(card_dir, filename)
+    missing = [size for size in thumbs.SIZES if not thumbs.thumb_path(card_dir, filename, size).exists()]
+    if missing:
+        raise RuntimeError(f"thumbnails not written: {missing}")
+
+
+_JOB_HANDLERS = {"thumbs": _job_thumbs}
 
 
 def _read_all_rows() -> list[dict]:
-    if not SUBMISSIONS_CSV.exists():
-        return []
-    with SUBMISSIONS_CSV.open("r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)
-        rows: list[dict] = []
-        for r in reader:
-            if not (r.get("id") or "").strip():
-                continue
-            rows.append(r)
-        return rows
-
-
-def _write_all_rows(rows: list[dict]) -> None:
-    # атомарная запись
-    tmp = SUBMISSIONS_CSV.with_suffix(".tmp")
-    cols = _csv_columns()
-    with tmp.open("w", encoding="utf-8", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=cols)
-        w.writeheader()
-        for r in rows:
-            out = {c: (r.get(c, "") or "") for c in cols}
-            w.writerow(out)
-    tmp.replace(SUBMISSIONS_CSV)
-
-
-def _find_row(rows: list[dict], sid: str) -> Optional[dict]:
-    for r in rows:
-        if (r.get("id") or "").strip() == sid:
-            return r
-    return None
+    return _store.rows()
+
+
+def get_submission(sid: str) -> Optional[dict]:
+    """Single card row by id (a copy) or None."""
+    return _store.get(sid)
 
 
 def _list_photos(sid: str) -> list[str]:
@@ -204,13 +384,35 @@ def _list_photos(sid: str) -> list[str]:
     return sorted([p.name for p in d.iterdir() if p.is_file()])
 
 
+def _file_version(path: Path) -> str:
+    # фото после сохранения не меняются; mtime+size ловят удаление и повторную загрузку
+    try:
+        st = path.stat()
+    except OSError:
+        return ""
+    return hashlib.blake2s(f"{st.st_mtime_ns}:{st.st_size}".encode(), digest_size=6).hexdigest()
+
+
+def upload_url(sid: str, filename: str) -> str:
+    """Versioned /uploads URL; safe to cache forever (see _photo_cache)."""
+    url = f"/uploads/{sid}/{quote(filename)}"
+    v = _file_version(UPLOADS_DIR / sid / filename)
+    return f"{url}?v={v}" if v else url
+
+
+app.jinja_env.globals["upload_url"] = upload_url
+
+
 def _thumb_url(sid: str, kind: str, photos: list[str]) -> str:
-    # превью: первое изображение, иначе лого
+    # превью: первое изображение (уменьшенная копия, если есть Pillow), иначе лого
     if photos:
         first = photos[0]
-        ext = first.rsplit(".", 1)[-1].lower() if "." in first else ""
-        if ext in {"jpg","jpeg","png","webp","gif"}:
-            return f"/uploads/{sid}/{quote(first)}"
+        if thumbs.is_image(first):
+            if thumbs.AVAILABLE:
+                # версия — от оригинала: превью строится из него
+                v = _file_version(UPLOADS_DIR / sid / first)
+                return f"/thumbs/{sid}/{thumbs.SIZES[0]}/{quote(first)}" + (f"?v={v}" if v else "")
+            return upload_url(sid, first)
     return "/static/logo.jpeg"
 
     # продавцы: первое фото, иначе лого
@@ -219,49 +421,79 @@ def _thumb_url(sid: str, kind: str, photos: list[str]) -> str:
     return "/static/logo.jpeg"
 
 
-def _load_submissions(limit: int = 200) -> list[dict]:
-    """Newer-first list for public page."""
-    if not SUBMISSIONS_CSV.exists():
-        return []
-
+def _load_submissions(limit: int = 200, after: Optional[tuple[str, str]] = None) -> list[dict]:
+    """Newer-first list for public page (optionally after a listing cursor)."""
     items: list[dict] = []
-    with SUBMISSIONS_CSV.open("r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            sid = (row.get("id") or "").strip()
-            if not sid:
-                continue
-
-            kind = (row.get("kind") or "material").strip().lower()
-
-            photos_raw = (row.get("photos") or "").strip()
-            photos = [p for p in photos_raw.split(";") if p] if photos_raw else []
-
-            items.append({
-                "id": sid,
-                "created_utc": (row.get("created_utc") or "").strip(),
-                "kind": kind,
-                "title": (row.get("title") or "").strip(),
-                "price_tenge": (row.get("price_tenge") or "").strip(),
-                "phone": (row.get("phone") or "").strip(),
-                "description": (row.get("description") or "").strip(),
-                "photos": photos,
-                "thumb_url": _thumb_url(sid, kind, photos),
-                "password": (row.get("password") or "").strip(),
-            })
-
-    # newest first: created_utc is ISO, so lexicographic sort works
-    items.sort(key=lambda x: x.get("created_utc", ""), reverse=True)
-    return items[:limit]
+    for row in _store.page(limit, after):
+        sid = (row.get("id") or "").strip()
+        kind = (row.get("kind") or "material").strip().lower()
 
+        photos_raw = (row.get("photos") or "").strip()
+        photos = [p for p in photos_raw.split(";") if p] if photos_raw else []
 
-# ----------------------------
-# Public routes
-# ----------------------------
+        items.append({
+            "id": sid,
+            "created_utc": (row.get("created_utc") or "").strip(),
+            "kind": kind,
+            "title": (row.get("title") or "").strip(),
+            "price_tenge": (row.get("price_tenge") or "").strip(),
+            "phone": (row.get("phone") or "").strip(),
+            "description": (row.get("description") or "").strip(),
+            "photos": photos,
+            "thumb_url": _thumb_url(sid, kind, photos),
+            "photo_url": upload_url(sid, photos[0]) if photos else "",
+            "password": (row.get("password") or "").strip(),
+        })
+    return items
 
-@app.get("/")
-def index():
-    submissions = _load_submissions(limit=int(os.environ.get("MAX_LISTINGS", "200")))
+
+def _card_key(s: dict) -> tuple:
+    try:
+        files_mtime = (UPLOADS_DIR / s["id"]).stat().st_mtime_ns if s["photos"] else 0
+    except OSError:
+        files_mtime = 0
+    digest = hashlib.blake2b(repr(sorted(s.items())).encode("utf-8"), digest_size=12).digest()
+    return s["id"], digest, files_mtime
+
+
+def card_html(s: dict) -> Markup:
+    """Rendered _card.html for one listing item, from the fragment cache if possible."""
+    key = _card_key(s)
+    html = _card_cache.get(key)
+    if html is None:
+        html = render_template("_card.html", s=s)
+        _card_cache.put(key, html)
+    return Markup(html)
+
+
+app.jinja_env.globals["card_html"] = card_html
+
+
+def _encode_cursor(item: dict) -> str:
+    raw = f"{item['created_utc']}|{item['id']}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError):
+        abort(400)
+    created, sep, sid = raw.rpartition("|")
+    if not sep:
+        abort(400)
+    return created, sid
+
+
+def _listing_page(cursor: str = "", limit: int = PAGE_SIZE) -> tuple[list[dict], Optional[str]]:
+    """One page of public cards (with unlock state) and the cursor of the next one."""
+    after = _decode_cursor(cursor) if cursor else None
+    # берём на одну больше, чтобы знать, есть ли следующая страница
+    submissions = _load_submissions(limit=limit + 1, after=after)
+    next_cursor = None
+    if len(submissions) > limit:
+        submissions = submissions[:limit]
+        next_cursor = _encode_cursor(submissions[-1])
 
     unlocked = set(session.get("unlocked_cards", []) or [])
     for s in submissions:
@@ -273,7 +505,98 @@ def index():
         if (s.get("password") or "").strip() and not s["unlocked"]:
             s["thumb_url"] = "/static/locked_thumb.svg"
 
-    return render_template("index.html", submissions=submissions)
+    return submissions, next_cursor
+
+
+# ----------------------------
+# Public routes
+# ----------------------------
+
+@app.get("/")
+def index():
+    # flash-сообщение делает страницу одноразовой — такие не кэшируем
+    if "_flashes" in session:
+        submissions, next_cursor = _listing_page()
+        return render_template("index.html", submissions=submissions, next_cursor=next_cursor)
+
+    etag = _listing_etag("index", PAGE_SIZE)
+    resp = _not_modified(etag)
+    if resp is not None:
+        return resp
+    body = _page_cache.get(etag)
+    if body is None:
+        submissions, next_cursor = _listing_page()
+        body = render_template("index.html", submissions=submissions, next_cursor=next_cursor).encode("utf-8")
+        _page_cache.put(etag, body)
+    return _listing_headers(Response(body, mimetype="text/html"), etag)
+
+
+@app.get("/api/listings")
+def api_listings():
+    limit = max(1, min(request.args.get("limit", PAGE_SIZE, type=int), 100))
+    cursor = request.args.get("cursor", "")
+    etag = _listing_etag("listings", cursor, limit)
+    resp = _not_modified(etag)
+    if resp is not None:
+        return resp
+    submissions, next_cursor = _listing_page(cursor, limit)
+    resp = jsonify(
+        html=render_template("_cards.html", submissions=submissions),
+        count=len(submissions),
+        next_cursor=next_cursor,
+    )
+    return _listing_headers(resp, etag)
+
+
+# поля карточки, которые можно отдавать наружу (пароль — никогда)
+API_FIELDS = (
+    "id", "created_utc", "kind", "title", "price_tenge", "phone", "description",
+    "photos", "thumb_url", "photo_url", "protected", "locked",
+)
+
+
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _api_item(s: dict) -> dict:
+    locked = bool(s["password"]) and not s["unlocked"]
+    item = {f: s[f] for f in API_FIELDS if f in s}
+    item["protected"] = bool(s["password"])  # есть пароль
+    item["locked"] = locked  # и эта сессия его не вводила
+    if locked:
+        # файлы защищённой карточки не светим: ни имён, ни ссылок
+        item["photos"] = []
+        item["photo_url"] = ""
+    return item
+
+
+@app.get("/api/submissions")
+def api_submissions():
+    limit = max(1, min(request.args.get("limit", PAGE_SIZE, type=int), 500))
+    cursor = request.args.get("cursor", "")
+    fields = [f for f in (request.args.get("fields") or "").split(",") if f]
+    unknown = sorted(set(fields) - set(API_FIELDS))
+    if unknown:
+        return jsonify(error=f"unknown fields: {', '.join(unknown)}", allowed=list(API_FIELDS)), 400
+
+    etag = _listing_etag("submissions", cursor, limit, tuple(fields))
+    resp = _not_modified(etag)
+    if resp is not None:
+        return resp
+    # несжатое тело; сжимает (и кэширует сжатое) _compress_response
+    key = ("api", etag)
+    body = _page_cache.get(key)
+    if body is None:
+        submissions, next_cursor = _listing_page(cursor, limit)
+        items = [_api_item(s) for s in submissions]
+        if fields:
+            items = [{f: it[f] for f in fields} for it in items]
+        body = _dumps({"items": items, "count": len(items), "next_cursor": next_cursor})
+        _page_cache.put(key, body)
+    return _listing_headers(Response(body, mimetype="application/json"), etag)
 
 
 @app.post("/submit")
@@ -284,8 +607,7 @@ def submit():
 
 @app.get("/thanks/<sid>")
 def thanks(sid: str):
-    rows = _read_all_rows()
-    r = _find_row(rows, sid)
+    r = get_submission(sid)
     kind = ((r.get("kind") or "sell") if r else "sell").strip().lower()
     if kind not in {"buy", "sell"}:
         kind = "sell"
@@ -303,8 +625,7 @@ def thanks(sid: str):
 @app.post("/unlock/<sid>")
 def unlock(sid: str):
     password = (request.form.get("password") or "").strip()
-    rows = _read_all_rows()
-    r = _find_row(rows, sid)
+    r = get_submission(sid)
     if not r:
         abort(404)
 
@@ -326,17 +647,85 @@ def unlock(sid: str):
 # Если не хочешь публичные ссылки на фото — удали этот роут
 @app.get("/uploads/<sid>/<path:filename>")
 def uploads(sid: str, filename: str):
-    # Если на карточке стоит пароль — файлы доступны только после ввода пароля
-    if not _is_admin():
-        rows = _read_all_rows()
-        r = _find_row(rows, sid)
-        if r:
-            expected = (r.get("password") or "").strip()
-            if expected:
-                unlocked = set(session.get("unlocked_cards", []) or [])
-                if sid not in unlocked:
-                    abort(403)
-    return send_from_directory(UPLOADS_DIR / sid, filename)
+    if sid.startswith(("_", ".")):  # _incoming и прочие служебные каталоги
+        abort(404)
+    if not _can_view_files(sid):
+        abort(403)
+    resp = _send_upload(UPLOADS_DIR / sid, filename)
+    return _photo_cache(resp, sid, UPLOADS_DIR / sid / filename)
+
+
+@app.get("/thumbs/<sid>/<int:size>/<path:filename>")
+def thumb(sid: str, size: int, filename: str):
+    if size not in thumbs.SIZES or sid.startswith(("_", ".")):
+        abort(404)
+    if not _can_view_files(sid):
+        abort(403)
+    card_dir = UPLOADS_DIR / sid
+    src = safe_join(str(card_dir), filename)
+    if src is None or not os.path.isfile(src):
+        abort(404)
+    # старые фото: превью строим при первом запросе
+    dst = thumbs.thumb_path(card_dir, filename, size)
+    if not dst.exists() and not thumbs.make_thumb(Path(src), dst, size):
+        # оригинал вместо превью — не навсегда: следующий запрос может получить превью
+        return _photo_cache(_send_upload(card_dir, filename), sid, Path(src), immutable=False)
+    return _photo_cache(_send_upload(dst.parent, dst.name), sid, Path(src))
+
+
+def _photo_cache(resp, sid: str, src: Path, immutable: bool = True):
+    # ?v= совпал с текущей версией файла и карточка открытая — кэш навсегда;
+    # защищённые паролем — только в браузере и с перепроверкой (ETag -> 304),
+    # чтобы доступ проверялся при каждом запросе
+    cc = resp.cache_control
+    v = request.args.get("v", "")
+    if immutable and v and sid not in _store.protected_ids() and v == _file_version(src):
+        cc.no_cache = None
+        cc.private = None
+        cc.public = True
+        cc.max_age = PHOTO_MAX_AGE
+        cc.immutable = True
+    else:
+        cc.public = None
+        cc.max_age = None
+        cc.private = True
+        cc.no_cache = True
+        resp.expires = None
+    return resp
+
+
+def _send_upload(directory: Path, filename: str):
+    """Send a file under UPLOADS_DIR, or hand it off to the front proxy."""
+    if SENDFILE_MODE == "accel":
+        path = safe_join(str(directory), filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        rel = Path(path).relative_to(UPLOADS_DIR).as_posix()
+        resp = Response(mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream")
+        # nginx сам отдаст файл (sendfile, Range, 304) из internal-локации
+        resp.headers["X-Accel-Redirect"] = ACCEL_PREFIX + quote(rel)
+        return resp
+    if SENDFILE_MODE == "sendfile":
+        resp = _wz_send_from_directory(
+            directory, filename, request.environ,
+            use_x_sendfile=True, response_class=app.response_class,
+        )
+        # заголовки WSGI — latin-1: путь передаём байтами UTF-8, как он лежит на диске
+        path = resp.headers.get("X-Sendfile")
+        if path is not None:
+            resp.headers["X-Sendfile"] = path.encode("utf-8").decode("latin-1")
+        return resp
+    return send_from_directory(directory, filename)
+
+
+def _can_view_files(sid: str) -> bool:
+    # Если на карточке стоит пароль — файлы доступны только после ввода пароля.
+    # Хватает множества защищённых id (кэш по версии данных), строку не читаем
+    if sid not in _store.protected_ids():
+        return True
+    if _is_admin():
+        return True
+    return sid in (session.get("unlocked_cards", []) or [])
 
 
 @app.get("/health")
@@ -370,10 +759,16 @@ def admin_required(fn):
     return wrapper
 
 
+@app.errorhandler(SchemaError)
+def schema_error(e: SchemaError):
+    # заголовок CSV не совпадает со схемой: запись отказана, файл не тронут
+    flash(f"Запись невозможна: {e}")
+    return redirect(request.referrer or "/admin")
+
+
 def _admin_submissions(limit: int = 500) -> list[dict]:
-    rows = _read_all_rows()
     items: list[dict] = []
-    for r in rows:
+    for r in _store.newest(limit):
         sid = (r.get("id") or "").strip()
         kind = (r.get("kind") or "sell").strip().lower()
         if kind not in {"buy", "sell"}:
@@ -394,9 +789,7 @@ def _admin_submissions(limit: int = 500) -> list[dict]:
             "thumb_url": _thumb_url(sid, kind, photos),
             "password": (r.get("password") or "").strip(),
         })
-
-    items.sort(key=lambda x: x.get("created_utc", ""), reverse=True)
-    return items[:limit]
+    return items
 
 
 @app.get("/admin/login")
@@ -462,20 +855,27 @@ def admin_create():
             target = sub_dir / safe
             if target.exists():
                 target = sub_dir / f"{target.stem}_{uuid.uuid4().hex[:6]}{target.suffix}"
-            f.save(target)
+            upload_stream.save_upload(f, target)
+            _process_photo(sid, target.name)
             saved_names.append(target.name)
 
-    _save_submission_row(
-        sid=sid,
-        created_utc=created_utc,
-        kind="material",
-        title=title,
-        price_tenge=price_tenge,
-        phone="",
-        description=description,
-        photos=saved_names,
-        password=password,
-    )
+    try:
+        _save_submission_row(
+            sid=sid,
+            created_utc=created_utc,
+            kind="material",
+            title=title,
+            price_tenge=price_tenge,
+            phone="",
+            description=description,
+            photos=saved_names,
+            password=password,
+        )
+    except SchemaError:
+        # карточка не записана — её файлы не нужны
+        shutil.rmtree(UPLOADS_DIR / sid, ignore_errors=True)
+        raise
+    _data_changed()
 
     flash("Карточка создана.")
     return redirect(f"/admin/edit/{sid}")
@@ -484,22 +884,23 @@ def admin_create():
 @app.get("/admin/edit/<sid>")
 @admin_required
 def admin_edit(sid: str):
-    rows = _read_all_rows()
-    r = _find_row(rows, sid)
+    r = get_submission(sid)
     if not r:
         abort(404)
 
     photos = _list_photos(sid)
     first_photo = photos[0] if photos else ""
     row = {c: (r.get(c, "") or "") for c in _csv_columns()}
-    return render_template("admin/edit.html", sid=sid, row=row, photos=photos, first_photo=first_photo)
+    jobs = _jobs.for_sid(sid) if _jobs is not None else []
+    return render_template(
+        "admin/edit.html", sid=sid, row=row, photos=photos, first_photo=first_photo, jobs=jobs
+    )
 
 
 @app.post("/admin/save/<sid>")
 @admin_required
 def admin_save(sid: str):
-    rows = _read_all_rows()
-    r = _find_row(rows, sid)
+    r = get_submission(sid)
     if not r:
         abort(404)
 
@@ -513,7 +914,8 @@ def admin_save(sid: str):
     photos = _list_photos(sid)
     r["photos"] = ";".join(photos)
 
-    _write_all_rows(rows)
+    _store.upsert(r)
+    _data_changed()
     flash("Сохранено.")
     return redirect(f"/admin/edit/{sid}")
 
@@ -521,13 +923,12 @@ def admin_save(sid: str):
 @app.post("/admin/delete/<sid>")
 @admin_required
 def admin_delete(sid: str):
-    rows = _read_all_rows()
-    rows2 = [r for r in rows if (r.get("id") or "").strip() != sid]
-    _write_all_rows(rows2)
+    _store.delete(sid)
 
     d = UPLOADS_DIR / sid
     if d.exists() and d.is_dir():
         shutil.rmtree(d)
+    _data_changed()
 
     flash(f"Удалено: {sid}")
     return redirect("/admin")
@@ -543,12 +944,13 @@ def admin_photo_delete(sid: str, filename: str):
 
     if p.exists() and p.is_file():
         p.unlink()
+        thumbs.drop_thumbs(base, p.name)
 
-    rows = _read_all_rows()
-    r = _find_row(rows, sid)
+    r = get_submission(sid)
     if r:
         r["photos"] = ";".join(_list_photos(sid))
-        _write_all_rows(rows)
+        _store.upsert(r)
+    _data_changed()
 
     return redirect(f"/admin/edit/{sid}")
 
@@ -572,27 +974,227 @@ def admin_upload(sid: str):
         target = sub_dir / name
         if target.exists():
             target = sub_dir / f"{target.stem}_{uuid.uuid4().hex[:6]}{target.suffix}"
-        f.save(target)
+        upload_stream.save_upload(f, target)
+        _process_photo(sid, target.name)
         saved += 1
 
-    rows = _read_all_rows()
-    r = _find_row(rows, sid)
+    r = get_submission(sid)
     if r:
         r["photos"] = ";".join(_list_photos(sid))
-        _write_all_rows(rows)
+        _store.upsert(r)
+    _data_changed()
 
     flash(f"Загружено файлов: {saved}")
     return redirect(f"/admin/edit/{sid}")
 
 
+def _import_cards(stream, fmt: str, photos_path: Optional[Path], dry_run: bool = False,
+                  workers: int = 8) -> tuple[int, int]:
+    """Validate, copy photos, then write all rows at once; returns (cards, photos)."""
+    photos = importer.PhotoSource(photos_path) if photos_path is not None else None
+    plan = importer.build_plan(
+        importer.read_records(stream, fmt),
+        _csv_columns(),
+        (r.get("id") or "" for r in _store.iter_rows()),
+        photos,
+        _new_id,
+        _now_iso,
+    )
+    if dry_run or not plan.rows:
+        return len(plan.rows), len(plan.copies)
+    if plan.copies:
+        importer.copy_photos(plan, photos, UPLOADS_DIR, workers=workers, after_copy=_process_photo)
+    _append_rows(plan.rows)
+    _data_changed()
+    return len(plan.rows), len(plan.copies)
+
+
+@app.get("/admin/import")
+@admin_required
+def admin_import():
+    return render_template("admin/import.html", errors=[], max_mb=IMPORT_MAX_MB)
+
+
+@app.post("/admin/import")
+@admin_required
+def admin_import_post():
+    cards = request.files.get("cards")
+    archive = request.files.get("photos_zip")
+    if not cards or not cards.filename:
+        flash("Не выбран файл с карточками.")
+        return redirect("/admin/import")
+    try:
+        fmt = importer.detect_format(cards.filename)
+    except ValueError as e:
+        flash(str(e))
+        return redirect("/admin/import")
+
+    zip_path = None
+    if archive and archive.filename:
+        zip_path = UPLOADS_DIR / upload_stream.STAGING_DIR / f"import-{uuid.uuid4().hex}.zip"
+        upload_stream.save_upload(archive, zip_path)
+    try:
+        n_cards, n_photos = _import_cards(cards.stream, fmt, zip_path,
+                                          dry_run=request.form.get("dry_run") == "1")
+    except importer.ImportFailed as e:
+        return render_template("admin/import.html", errors=e.errors, max_mb=IMPORT_MAX_MB), 400
+    except ValueError as e:
+        flash(str(e))
+        return redirect("/admin/import")
+    finally:
+        if zip_path is not None:
+            zip_path.unlink(missing_ok=True)
+
+    if request.form.get("dry_run") == "1":
+        flash(f"Проверка пройдена: карточек {n_cards}, файлов {n_photos}. Ничего не записано.")
+        return redirect("/admin/import")
+    flash(f"Импортировано карточек: {n_cards}, файлов: {n_photos}")
+    return redirect("/admin")
+
+
 @app.get("/admin/csv")
 @admin_required
 def admin_csv_download():
-    if not SUBMISSIONS_CSV.exists():
-        abort(404)
-    return send_file(SUBMISSIONS_CSV, as_attachment=True, download_name="submissions.csv")
+    # ?from=2026-01-01&to=2026-03&has_photos=1&has_password=0&columns=id,title&format=ndjson
+    fmt = (request.args.get("format") or "csv").strip().lower()
+    if fmt not in export.FORMATS:
+        abort(400, f"format: {', '.join(export.FORMATS)}")
+    columns = _csv_columns()
+    if request.args.get("columns"):
+        columns = [c for c in request.args["columns"].split(",") if c]
+        unknown = sorted(set(columns) - set(_csv_columns()))
+        if unknown:
+            abort(400, f"unknown columns: {', '.join(unknown)}")
+    flt = export.RowFilter.from_args(request.args)
+
+    if STORAGE_BACKEND == "csv" and fmt == "csv" and flt.empty and columns == _csv_columns():
+        if not SUBMISSIONS_CSV.exists():
+            abort(404)
+        # журнал правок вливаем в основной файл и отдаём файл как есть
+        _store.compact()
+        return send_file(SUBMISSIONS_CSV, as_attachment=True, download_name="submissions.csv")
+
+    # генератор по строкам: память не зависит от размера выгрузки
+    def rows():
+        return (r for r in _store.iter_rows() if flt(r))
+
+    if fmt == "csv":
+        chunks = export.csv_chunks(rows(), columns)
+    elif fmt == "ndjson":
+        chunks = export.ndjson_chunks(rows(), columns)
+    else:
+        # по проходу на колонку — все по одному снимку, иначе правка между
+        # проходами даст колонки разной длины
+        def columnar():
+            with _store.snapshot() as snap:
+                yield from export.columnar_chunks(lambda: (r for r in snap() if flt(r)), columns)
+
+        chunks = columnar()
+    mimetype, ext = export.FORMATS[fmt]
+    return Response(
+        chunks,
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=submissions.{ext}"},
+    )
+
+
+def warm_up() -> None:
+    """Compile every template and load the store before serving traffic.
+
+    Called by gunicorn.conf.py (in the master with preload, so forked
+    workers inherit the result) and on ASGI startup.
+    """
+    for name in app.jinja_env.list_templates(extensions=["html"]):
+        app.jinja_env.get_template(name)
+    _store.page(PAGE_SIZE + 1)  # как _listing_page: на одну больше для курсора
+    _store.protected_ids()
+    if isinstance(_store, CsvStore):
+        _store.build_index()
+
+
+@app.cli.command("migrate")
+@click.option("--dry-run", is_flag=True, help="Показать, что изменится, и оценить время.")
+@click.option("--drop-unknown", is_flag=True, help="Удалить колонки, которых нет в схеме.")
+def migrate_command(dry_run: bool, drop_unknown: bool):
+    """Bring submissions.csv up to the current schema."""
+    if STORAGE_BACKEND != "csv":
+        raise click.ClickException("migrations apply to the CSV backend only")
+    if dry_run:
+        plan = _migration_plan()
+        plan.estimate()
+        for line in plan.describe():
+            click.echo(line)
+        return
+    try:
+        n = _migrate_schema(drop_unknown=drop_unknown)
+    except migrations.MigrationError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Schema version {migrations.read_version(SCHEMA_VERSION_FILE)}, {n} records rewritten")
+
+
+@app.cli.command("import-csv")
+@click.option("--csv", "csv_path", type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              default=SUBMISSIONS_CSV, show_default=True)
+@click.option("--force", is_flag=True, help="Перезаписать непустую базу.")
+def import_csv_command(csv_path: Path, force: bool):
+    """One-shot import of submissions.csv into the SQLite backend."""
+    from store_sqlite import SqliteStore, import_csv
+
+    db = _store if isinstance(_store, SqliteStore) else SqliteStore(
+        DATA_DIR / "submissions.sqlite3", _csv_columns()
+    )
+    if db.count() and not force:
+        raise click.ClickException(f"{db.path} is not empty (use --force to replace)")
+    n = import_csv(csv_path, db)
+    click.echo(f"Imported {n} rows into {db.path}")
+
+
+@app.cli.command("import-cards")
+@click.argument("cards", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--photos", "photos_path", type=click.Path(exists=True, path_type=Path),
+              help="Каталог или .zip с файлами (пути в колонке photos — относительно него).")
+@click.option("--workers", type=int, default=8, show_default=True, help="Потоков копирования файлов.")
+@click.option("--dry-run", is_flag=True, help="Только проверить, ничего не записывать.")
+def import_cards_command(cards: Path, photos_path: Optional[Path], workers: int, dry_run: bool):
+    """Bulk-create cards from a CSV or NDJSON file (all or nothing)."""
+    try:
+        fmt = importer.detect_format(cards.name)
+        with cards.open("rb") as f:
+            n_cards, n_photos = _import_cards(f, fmt, photos_path, dry_run=dry_run, workers=workers)
+    except importer.ImportFailed as e:
+        for line, msg in e.errors:
+            click.echo(f"{cards.name}:{line}: {msg}", err=True)
+        raise click.ClickException(f"{len(e.errors)} error(s), nothing imported")
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    verb = "Would import" if dry_run else "Imported"
+    click.echo(f"{verb} {n_cards} cards, {n_photos} files")
+
+
+@app.cli.command("backfill-thumbs")
+@click.option("--force", is_flag=True, help="Пересоздать уже существующие превью.")
+def backfill_thumbs_command(force: bool):
+    """Generate thumbnails for photos uploaded before the pipeline existed."""
+    if not thumbs.AVAILABLE:
+        raise click.ClickException("Pillow is not installed")
+    photos = made = 0
+    for card_dir, name in thumbs.iter_photos(UPLOADS_DIR):
+        photos += 1
+        made += thumbs.make_thumbs(card_dir, name, force=force)
+    click.echo(f"{photos} photos, {made} thumbnails written")
+
+
+@app.cli.command("jobs-worker")
+@click.option("--poll", type=float, default=1.0, show_default=True, help="Пауза при пустой очереди, сек.")
+@click.option("--once", is_flag=True, help="Выполнить готовые задачи и выйти.")
+def jobs_worker_command(poll: float, once: bool):
+    """Run queued photo jobs (start next to gunicorn when JOB_QUEUE=1)."""
+    queue = _jobs or JobQueue(DATA_DIR / "jobs.sqlite3")
+    queue.purge()
+    n = run_worker(queue, _JOB_HANDLERS, poll=poll, once=once)
+    click.echo(f"{n} jobs processed")
 
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", "10000"))
-    app.run(host="0.0.0.0", port=port)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=port)
@@ -0,0 +1,188 @@
+"""ASGI entry point: ``uvicorn asgi:app``.
+
+Flask views stay synchronous and run in a thread pool. The event loop only
+moves bytes: the request body is fed to the view on demand, and the
+response is sent chunk by chunk. A slow client downloading a photo
+therefore holds a coroutine, not a worker thread, and listing and CSV
+reads never block the loop. Nothing beyond the standard library is used
+here; uvicorn (or any ASGI server) is only needed to run it.
+
+    ASGI_THREADS=16 uvicorn asgi:app --host 0.0.0.0 --port $PORT
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from app import app as flask_app, warm_up
+
+THREADS = int(os.environ.get("ASGI_THREADS", "8"))
+
+
+class _Body:
+    """``wsgi.input`` that pulls ASGI ``http.request`` messages as the view reads."""
+
+    def __init__(self, receive, loop: asyncio.AbstractEventLoop):
+        self._receive = receive
+        self._loop = loop
+        self._buf = bytearray()
+        self._more = True
+
+    def _fill(self, want: Optional[int]) -> None:
+        while self._more and (want is None or len(self._buf) < want):
+            msg = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if msg["type"] == "http.disconnect":
+                self._more = False
+                break
+            self._buf += msg.get("body", b"")
+            self._more = msg.get("more_body", False)
+
+    def read(self, size: int = -1) -> bytes:
+        self._fill(None if size is None or size < 0 else size)
+        n = len(self._buf) if size is None or size < 0 else min(size, len(self._buf))
+        data = bytes(self._buf[:n])
+        del self._buf[:n]
+        return data
+
+    def readline(self, size: int = -1) -> bytes:
+        while b"\n" not in self._buf and self._more and (size < 0 or len(self._buf) < size):
+            self._fill(len(self._buf) + 1)
+        end = self._buf.find(b"\n") + 1 or len(self._buf)
+        if size >= 0:
+            end = min(end, size)
+        data = bytes(self._buf[:end])
+        del self._buf[:end]
+        return data
+
+    def __iter__(self):
+        while line := self.readline():
+            yield line
+
+
+def _environ(scope: dict, body: _Body) -> dict:
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    path = scope["path"]
+    root = scope.get("root_path", "")
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root,
+        "PATH_INFO": path[len(root):] if root and path.startswith(root) else path,
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        # _Body сам заканчивается на more_body=False: тело без Content-Length
+        # (chunked) Werkzeug читает до конца, а не считает пустым
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name == "CONTENT_TYPE" or name == "CONTENT_LENGTH":
+            key = name
+        else:
+            key = f"HTTP_{name}"
+        if key in environ:
+            # повторные заголовки склеиваем через запятую, Cookie — через "; "
+            value = environ[key] + ("; " if key == "HTTP_COOKIE" else ",") + value
+        environ[key] = value
+    return environ
+
+
+class AsgiApp:
+    """Minimal WSGI-to-ASGI bridge tuned for this app (see module docstring)."""
+
+    def __init__(self, wsgi_app, threads: int = THREADS):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix="wsgi")
+        return self._pool
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            msg = await receive()
+            if msg["type"] == "lifespan.startup":
+                await asyncio.get_running_loop().run_in_executor(self.pool, warm_up)
+                await send({"type": "lifespan.startup.complete"})
+            elif msg["type"] == "lifespan.shutdown":
+                if self._pool is not None:
+                    self._pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = None
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send) -> None:
+        loop = asyncio.get_running_loop()
+        environ = _environ(scope, _Body(receive, loop))
+        started: dict = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and started:
+                raise exc_info[1].with_traceback(exc_info[2])
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = [
+                (k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers
+            ]
+
+        result = await loop.run_in_executor(self.pool, self.wsgi_app, environ, start_response)
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": started["status"],
+                "headers": started["headers"],
+            })
+            if isinstance(result, (list, tuple)):
+                # готовое тело (страницы, JSON) — без лишних переходов в пул
+                for chunk in result:
+                    if chunk:
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            else:
+                # файлы и генераторы: следующий кусок читаем в пуле, отправляем
+                # из цикла — медленный клиент не держит поток
+                it = iter(result)
+                while True:
+                    chunk = await loop.run_in_executor(self.pool, next, it, None)
+                    if chunk is None:
+                        break
+                    if chunk:
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            close = getattr(result, "close", None)
+            if close is not None:
+                await loop.run_in_executor(self.pool, close)
+
+
+app = AsgiApp(flask_app)
+
+
+if __name__ == "__main__":
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("uvicorn is not installed: pip install uvicorn, or run `gunicorn app:app`")
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", "10000")))
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import gzip
+import zlib
+from typing import Iterable, Iterator, Optional
+
+try:
+    import brotli
+except ImportError:  # без brotli/zstandard остаётся gzip
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# в порядке предпочтения при равном q у клиента
+ENCODINGS = (
+    (["br"] if brotli is not None else [])
+    + (["zstd"] if zstandard is not None else [])
+    + ["gzip"]
+)
+
+# меньше — заголовки дороже выигрыша
+MIN_SIZE = 512
+
+# картинки (кроме svg), архивы и т.п. уже сжаты
+_COMPRESSIBLE = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+def compressible(mimetype: Optional[str]) -> bool:
+    return bool(mimetype) and (mimetype.startswith("text/") or mimetype in _COMPRESSIBLE)
+
+
+def best_encoding(accept_encodings) -> Optional[str]:
+    """Pick a supported coding from a werkzeug ``Accept-Encoding`` header object."""
+    return accept_encodings.best_match(ENCODINGS)
+
+
+def encode(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=6).compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    raise ValueError(f"unsupported encoding: {encoding}")
+
+
+def encode_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Compress an iterable of chunks incrementally (for large streamed bodies)."""
+    if encoding == "br":
+        c = brotli.Compressor(quality=4)
+        feed, finish = c.process, c.finish
+    elif encoding == "zstd":
+        c = zstandard.ZstdCompressor(level=3).compressobj()
+        feed, finish = c.compress, c.flush
+    elif encoding == "gzip":
+        c = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        feed, finish = c.compress, c.flush
+    else:
+        raise ValueError(f"unsupported encoding: {encoding}")
+    try:
+        for chunk in chunks:
+            out = feed(chunk)
+            if out:
+                yield out
+        yield finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
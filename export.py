@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import Callable, Iterable, Iterator, Optional
+
+# формат -> (mimetype, расширение файла)
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "columnar": ("application/json", "json"),
+}
+
+# отдаём кусками примерно такого размера, а не по строке
+CHUNK = 64 * 1024
+
+
+def _truthy(value: Optional[str]) -> Optional[bool]:
+    if value is None or value == "":
+        return None
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+class RowFilter:
+    """Filters for exports: ``created_utc`` range and has-photos/has-password.
+
+    ``date_from``/``date_to`` compare against the ISO ``created_utc`` prefix,
+    so ``2026-03`` or ``2026-03-01`` both work and ``date_to`` is inclusive.
+    """
+
+    def __init__(
+        self,
+        date_from: str = "",
+        date_to: str = "",
+        has_photos: Optional[bool] = None,
+        has_password: Optional[bool] = None,
+    ):
+        self.date_from = date_from.strip()
+        self.date_to = date_to.strip()
+        self.has_photos = has_photos
+        self.has_password = has_password
+
+    @classmethod
+    def from_args(cls, args) -> "RowFilter":
+        return cls(
+            date_from=args.get("from", ""),
+            date_to=args.get("to", ""),
+            has_photos=_truthy(args.get("has_photos")),
+            has_password=_truthy(args.get("has_password")),
+        )
+
+    @property
+    def empty(self) -> bool:
+        return not (self.date_from or self.date_to) and self.has_photos is None and self.has_password is None
+
+    def __call__(self, row: dict) -> bool:
+        created = (row.get("created_utc") or "").strip()
+        if self.date_from and created < self.date_from:
+            return False
+        if self.date_to and created[:len(self.date_to)] > self.date_to:
+            return False
+        if self.has_photos is not None and bool((row.get("photos") or "").strip()) != self.has_photos:
+            return False
+        if self.has_password is not None and bool((row.get("password") or "").strip()) != self.has_password:
+            return False
+        return True
+
+
+def _buffered(pieces: Iterable[str]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    for piece in pieces:
+        buf.write(piece)
+        if buf.tell() >= CHUNK:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def csv_chunks(rows: Iterable[dict], columns: list[str]) -> Iterator[bytes]:
+    line = io.StringIO()
+    w = csv.writer(line)
+
+    def take() -> str:
+        text = line.getvalue()
+        line.seek(0)
+        line.truncate()
+        return text
+
+    def pieces() -> Iterator[str]:
+        w.writerow(columns)
+        yield take()
+        for r in rows:
+            w.writerow([(r.get(c, "") or "") for c in columns])
+            yield take()
+
+    return _buffered(pieces())
+
+
+def ndjson_chunks(rows: Iterable[dict], columns: list[str]) -> Iterator[bytes]:
+    return _buffered(
+        json.dumps({c: (r.get(c, "") or "") for c in columns}, ensure_ascii=False) + "\n"
+        for r in rows
+    )
+
+
+def columnar_chunks(rows_factory: Callable[[], Iterable[dict]], columns: list[str]) -> Iterator[bytes]:
+    """``{"columns": [...], "data": {col: [values...]}}``, one pass per column.
+
+    Each column re-reads the rows from ``rows_factory`` instead of holding
+    the table in memory, so it must return the same rows every time (iterate
+    a store ``snapshot()``).
+    """
+
+    def pieces() -> Iterator[str]:
+        yield '{"columns":' + json.dumps(columns, ensure_ascii=False) + ',"data":{'
+        for i, c in enumerate(columns):
+            yield ("," if i else "") + json.dumps(c) + ":["
+            for j, r in enumerate(rows_factory()):
+                yield ("," if j else "") + json.dumps(r.get(c, "") or "", ensure_ascii=False)
+            yield "]"
+        yield "}}\n"
+
+    return _buffered(pieces())
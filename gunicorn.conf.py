@@ -0,0 +1,68 @@
+"""gunicorn settings: ``gunicorn -c gunicorn.conf.py app:app``.
+
+Everything can be overridden from the environment (Render: Environment tab):
+
+    WEB_CONCURRENCY         workers (default: 2 * CPU + 1, at most GUNICORN_MAX_WORKERS)
+    GUNICORN_MAX_WORKERS    cap for the default above (4: the free plan has 512 MB)
+    GUNICORN_WORKER_CLASS   gthread (default) | sync | gevent
+    GUNICORN_THREADS        threads per gthread worker (4)
+    GUNICORN_PRELOAD        1/0, import the app once before fork (default 1, 0 for gevent)
+    GUNICORN_MAX_REQUESTS   recycle a worker after N requests (1000, 0 = never)
+    GUNICORN_TIMEOUT        worker timeout, seconds (30)
+"""
+from __future__ import annotations
+
+import importlib.util
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+
+_cpu = multiprocessing.cpu_count()
+workers = int(os.environ.get(
+    "WEB_CONCURRENCY",
+    min(2 * _cpu + 1, int(os.environ.get("GUNICORN_MAX_WORKERS", "4"))),
+))
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread").strip().lower()
+if worker_class == "gevent" and importlib.util.find_spec("gevent") is None:
+    worker_class = "gthread"  # gevent не установлен — не падаем на старте
+threads = int(os.environ.get("GUNICORN_THREADS", "4")) if worker_class == "gthread" else 1
+worker_connections = 200  # gevent: одновременных клиентов на воркер
+
+# preload: шаблоны, индекс карточек и т.п. грузятся один раз в мастере, воркеры
+# получают их через fork (copy-on-write). Хранилища сами переоткрывают файлы и
+# соединения после fork. gevent патчит stdlib в воркере, поэтому там — без preload
+preload_app = os.environ.get(
+    "GUNICORN_PRELOAD", "0" if worker_class == "gevent" else "1"
+) == "1"
+
+# перезапуск воркеров ограничивает рост памяти; jitter — чтобы не все сразу
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = max(1, max_requests // 10) if max_requests else 0
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 20
+keepalive = 5
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+
+def when_ready(server):
+    if preload_app:
+        # шаблоны и CSV/индекс — в мастере, воркеры получают готовое через fork
+        from app import warm_up
+
+        warm_up()
+    server.log.info(
+        "%s x %d worker(s), %d thread(s), preload=%s, max_requests=%d",
+        worker_class, workers, threads, preload_app, max_requests,
+    )
+
+
+def post_worker_init(worker):
+    if not preload_app:
+        from app import warm_up
+
+        warm_up()
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import re
+import shutil
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import IO, Callable, Iterable, Iterator, Optional
+
+from werkzeug.utils import secure_filename
+
+BATCH = 500
+MAX_ERRORS = 100
+_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,40}$")
+
+
+class ImportFailed(Exception):
+    """Validation failed; ``errors`` holds ``(line, message)`` pairs."""
+
+    def __init__(self, errors: list[tuple[int, str]]):
+        super().__init__(f"{len(errors)} error(s)")
+        self.errors = errors
+
+
+def detect_format(filename: str) -> str:
+    name = filename.lower()
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if name.endswith(".csv"):
+        return "csv"
+    raise ValueError(f"{filename}: ожидается .csv или .ndjson")
+
+
+def read_records(stream: IO[bytes], fmt: str) -> Iterator[tuple[int, dict]]:
+    """``(line, record)`` from a CSV (with header) or NDJSON byte stream."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for rec in reader:
+            yield reader.line_num, rec
+        return
+    for n, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError as e:
+            yield n, {"__error__": f"bad JSON: {e}"}
+            continue
+        yield n, rec if isinstance(rec, dict) else {"__error__": "expected a JSON object"}
+
+
+class PhotoSource:
+    """Photos for an import: a directory or a zip archive (paths relative to it)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.is_zip = zipfile.is_zipfile(path) if path.is_file() else False
+        if not self.is_zip and not path.is_dir():
+            raise ValueError(f"{path}: нужен каталог или .zip")
+        self._local = threading.local()
+        self._opened: list[zipfile.ZipFile] = []
+        if self.is_zip:
+            with zipfile.ZipFile(path) as zf:
+                self.names = {n for n in zf.namelist() if not n.endswith("/")}
+        else:
+            self.names = {p.relative_to(path).as_posix() for p in path.rglob("*") if p.is_file()}
+
+    def resolve(self, name: str) -> Optional[str]:
+        name = PurePosixPath(name.strip().replace("\\", "/")).as_posix().lstrip("/")
+        return name if name in self.names and ".." not in name.split("/") else None
+
+    def copy(self, name: str, dst: Path) -> None:
+        tmp = dst.with_name(f".{dst.name}.part")
+        if self.is_zip:
+            # ZipFile нельзя читать из нескольких потоков — свой на поток
+            zf = getattr(self._local, "zf", None)
+            if zf is None:
+                zf = self._local.zf = zipfile.ZipFile(self.path)
+                self._opened.append(zf)
+            with zf.open(name) as src, tmp.open("wb") as out:
+                shutil.copyfileobj(src, out, 1024 * 1024)
+        else:
+            shutil.copyfile(self.path / name, tmp)
+        tmp.replace(dst)
+
+    def close(self) -> None:
+        for zf in self._opened:
+            zf.close()
+        self._opened.clear()
+
+
+class Plan:
+    """Validated rows plus the photo copies they need."""
+
+    def __init__(self):
+        self.rows: list[dict] = []
+        self.copies: list[tuple[str, str, str]] = []  # (sid, source name, target name)
+
+
+def build_plan(
+    records: Iterable[tuple[int, dict]],
+    columns: list[str],
+    existing_ids: Iterable[str],
+    photos: Optional[PhotoSource],
+    new_id: Callable[[], str],
+    now: Callable[[], str],
+) -> Plan:
+    """Validate records batch by batch; raise ``ImportFailed`` on any error."""
+    plan = Plan()
+    errors: list[tuple[int, str]] = []
+    seen = set(existing_ids)
+    allowed = set(columns)
+    batch: list[tuple[int, dict]] = []
+
+    def flush() -> None:
+        for line, rec in batch:
+            err = _validate(rec, line, plan, allowed, seen, photos, new_id, now, columns)
+            if err:
+                errors.append((line, err))
+        batch.clear()
+        if len(errors) >= MAX_ERRORS:
+            raise ImportFailed(errors)
+
+    for item in records:
+        batch.append(item)
+        if len(batch) >= BATCH:
+            flush()
+    flush()
+    if errors:
+        raise ImportFailed(errors)
+    return plan
+
+
+def _validate(rec, line, plan, allowed, seen, photos, new_id, now, columns) -> Optional[str]:
+    if "__error__" in rec:
+        return rec["__error__"]
+    unknown = sorted(k for k in rec if k and k not in allowed)
+    if unknown:
+        return f"unknown columns: {', '.join(unknown)}"
+    rec = {k: _text(v) for k, v in rec.items() if k}
+
+    sid = rec.get("id", "").strip()
+    if sid:
+        if not _ID_RE.match(sid):
+            return f"bad id {sid!r}"
+        if sid in seen:
+            return f"duplicate id {sid}"
+    else:
+        sid = new_id()
+    created = rec.get("created_utc", "").strip()
+    if created:
+        try:
+            datetime.fromisoformat(created)
+        except ValueError:
+            return f"bad created_utc {created!r}"
+    if not rec.get("title", "").strip():
+        return "title is required"
+
+    names: list[str] = []
+    copies: list[tuple[str, str, str]] = []
+    for raw in (p for p in rec.get("photos", "").split(";") if p.strip()):
+        src = photos.resolve(raw) if photos is not None else None
+        if src is None:
+            return f"photo not found: {raw}"
+        base = PurePosixPath(secure_filename(PurePosixPath(src).name) or "file")
+        name, n = base.name, 1
+        while name in names:
+            name = f"{base.stem}_{n}{base.suffix}"
+            n += 1
+        names.append(name)
+        copies.append((sid, src, name))
+
+    seen.add(sid)
+    row = {c: rec.get(c, "").strip() for c in columns}
+    row.update(
+        id=sid,
+        created_utc=created or now(),
+        kind=(row.get("kind") or "material").lower(),
+        photos=";".join(names),
+    )
+    plan.rows.append(row)
+    plan.copies.extend(copies)
+    return None
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ";".join(str(v) for v in value)
+    return str(value)
+
+
+def copy_photos(
+    plan: Plan,
+    photos: PhotoSource,
+    uploads_dir: Path,
+    workers: int = 8,
+    after_copy: Optional[Callable[[str, str], None]] = None,
+) -> int:
+    """Copy every planned photo into ``uploads_dir/<sid>/`` using a thread pool.
+
+    On failure the card directories created here are removed again.
+    """
+    created: list[Path] = []
+    for sid in dict.fromkeys(sid for sid, _, _ in plan.copies):
+        d = uploads_dir / sid
+        if not d.exists():
+            d.mkdir(parents=True)
+            created.append(d)
+
+    def one(job: tuple[str, str, str]) -> None:
+        sid, src, name = job
+        photos.copy(src, uploads_dir / sid / name)
+        if after_copy is not None:
+            after_copy(sid, name)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import") as pool:
+            for _ in pool.map(one, plan.copies):
+                pass
+    except BaseException:
+        for d in created:
+            shutil.rmtree(d, ignore_errors=True)
+        raise
+    finally:
+        photos.close()
+    return len(plan.copies)
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, Optional
+
+log = logging.getLogger(__name__)
+
+# queued -> running -> done | (ошибка) queued с задержкой ... -> failed
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+BACKOFF_BASE = 10.0     # сек, удваивается с каждой попыткой
+BACKOFF_MAX = 3600.0
+LEASE = 600.0           # running дольше этого — воркер умер, задачу можно брать снова
+
+
+class JobQueue:
+    """Persistent job queue in an SQLite file (usually ``DATA_DIR/jobs.sqlite3``).
+
+    Web workers ``enqueue``; a separate worker process ``claim``s jobs,
+    runs them and reports ``done`` or ``fail``. Failed jobs are retried
+    with exponential backoff up to ``max_attempts``.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                sid TEXT NOT NULL DEFAULT '',
+                payload TEXT NOT NULL DEFAULT '{}',
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                run_after REAL NOT NULL,
+                error TEXT NOT NULL DEFAULT '',
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_ready ON jobs(status, run_after);
+            CREATE INDEX IF NOT EXISTS jobs_sid ON jobs(sid, id);
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        # как в SqliteStore: соединение на поток, новое после fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def enqueue(self, kind: str, sid: str = "", max_attempts: int = 5, **payload) -> int:
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO jobs (kind, sid, payload, status, max_attempts, run_after, created, updated)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (kind, sid, json.dumps(payload, ensure_ascii=False), QUEUED, max_attempts, now, now, now),
+        )
+        return cur.lastrowid
+
+    def claim(self) -> Optional[dict]:
+        """Take the oldest ready job (or one whose worker died) and mark it running."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE (status = ? AND run_after <= ?) OR (status = ? AND updated < ?)"
+                " ORDER BY run_after, id LIMIT 1",
+                (QUEUED, now, RUNNING, now - LEASE),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                    (RUNNING, now, row["id"]),
+                )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        if row is None:
+            return None
+        job = dict(row)
+        job["attempts"] += 1
+        job["payload"] = json.loads(job["payload"] or "{}")
+        return job
+
+    def done(self, job_id: int) -> None:
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, error = '', updated = ? WHERE id = ?",
+            (DONE, time.time(), job_id),
+        )
+
+    def fail(self, job: dict, error: str) -> None:
+        now = time.time()
+        if job["attempts"] >= job["max_attempts"]:
+            status, run_after = FAILED, now
+        else:
+            status = QUEUED
+            run_after = now + min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (job["attempts"] - 1))
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, run_after = ?, error = ?, updated = ? WHERE id = ?",
+            (status, run_after, error[-2000:], now, job["id"]),
+        )
+
+    def for_sid(self, sid: str, limit: int = 20) -> list[dict]:
+        cur = self._conn().execute(
+            "SELECT * FROM jobs WHERE sid = ? ORDER BY id DESC LIMIT ?", (sid, limit)
+        )
+        jobs = []
+        for row in cur:
+            job = dict(row)
+            job["payload"] = json.loads(job["payload"] or "{}")
+            jobs.append(job)
+        return jobs
+
+    def purge(self, older_than: float = 7 * 24 * 3600) -> int:
+        """Drop finished jobs older than ``older_than`` seconds."""
+        cur = self._conn().execute(
+            "DELETE FROM jobs WHERE status = ? AND updated < ?", (DONE, time.time() - older_than)
+        )
+        return cur.rowcount
+
+
+def run_worker(
+    queue: JobQueue,
+    handlers: dict[str, Callable[..., None]],
+    poll: float = 1.0,
+    once: bool = False,
+) -> int:
+    """Process jobs until interrupted (or until the queue is empty with ``once``).
+
+    A handler gets ``sid`` and the job payload as keyword arguments; any
+    exception counts as a failed attempt.
+    """
+    processed = 0
+    while True:
+        job = queue.claim()
+        if job is None:
+            if once:
+                return processed
+            time.sleep(poll)
+            continue
+        handler = handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise LookupError(f"unknown job kind: {job['kind']}")
+            handler(sid=job["sid"], **job["payload"])
+        except Exception as exc:
+            log.warning("job %s (%s) failed: %s", job["id"], job["kind"], exc)
+            queue.fail(job, "".join(traceback.format_exception_only(type(exc), exc)).strip())
+        else:
+            queue.done(job["id"])
+        processed += 1
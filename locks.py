@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock is taken
+    fcntl = None
+
+
+class FileLock:
+    """Exclusive writer lock shared by threads and processes.
+
+    Uses ``fcntl.flock`` on a lock file, so gunicorn workers serialize
+    their writes; readers never take it. Re-entrant within a thread.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._tlock = threading.RLock()
+        self._depth = 0
+        self._fd: int | None = None
+        self._owner: int | None = None
+
+    def __enter__(self) -> "FileLock":
+        self._tlock.acquire()
+        if self._depth == 0:
+            try:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+            except BaseException:
+                self._tlock.release()
+                raise
+            self._fd = fd
+            self._owner = threading.get_ident()
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            self._owner = None
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        self._tlock.release()
+
+    def busy(self) -> bool:
+        """True if another thread or process holds the lock right now; never blocks."""
+        if self._owner == threading.get_ident():
+            return False
+        if fcntl is None:
+            return self._depth > 0
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return False  # ещё никто не писал
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        finally:
+            os.close(fd)  # закрытие снимает и наш пробный замок
+        return False
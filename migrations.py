@@ -0,0 +1,252 @@
+"""Schema migrations for ``submissions.csv`` (and its journal).
+
+Migrations are numbered; the last applied number is kept in
+``DATA_DIR/schema_version``. All pending steps are applied in one streamed
+pass (csv.reader -> tmp file -> replace), so memory use does not depend on
+the file size. After the numbered steps the header is conformed to the
+app's column list: missing columns are added empty and the order is fixed.
+Unknown columns are only dropped when asked to explicitly.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import time
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from store import SchemaError
+
+# сколько строк прогнать для оценки времени в dry-run
+SAMPLE_ROWS = 2000
+
+
+class MigrationError(SchemaError):
+    pass
+
+
+class Migration:
+    """One numbered step: ``header(old) -> new`` plus an optional per-row fix.
+
+    ``row`` gets and returns a dict keyed by column name. Both must be
+    idempotent: a file replaced with an old copy gets all steps again.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        description: str,
+        header: Callable[[list[str]], list[str]],
+        row: Optional[Callable[[dict], dict]] = None,
+    ):
+        self.version = version
+        self.description = description
+        self.header = header
+        self.row = row
+
+
+def _add_column(name: str) -> Callable[[list[str]], list[str]]:
+    return lambda header: header if name in header else header + [name]
+
+
+# новые шаги — только в конец, номера не переиспользовать
+MIGRATIONS = [
+    Migration(1, "add password column", _add_column("password")),
+]
+
+
+def latest() -> int:
+    return max((m.version for m in MIGRATIONS), default=0)
+
+
+def read_version(marker: Path) -> int:
+    try:
+        return int(marker.read_text().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_version(marker: Path, version: int) -> None:
+    tmp = marker.with_name(marker.name + ".tmp")
+    tmp.write_text(f"{version}\n")
+    tmp.replace(marker)
+
+
+def read_header(path: Path) -> Optional[list[str]]:
+    # только первая строка, не весь файл
+    try:
+        with path.open("r", encoding="utf-8", newline="") as f:
+            return next(csv.reader(f), None)
+    except FileNotFoundError:
+        return None
+
+
+def _size(n: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+class FilePlan:
+    """How one file gets rewritten: its header before, after the steps, and the target."""
+
+    def __init__(self, path: Path, header: list[str], stepped: list[str], target: list[str], journal: bool):
+        self.path = path
+        self.header = header  # без "op" у журнала
+        self.stepped = stepped
+        self.target = target
+        self.journal = journal
+        self.size = path.stat().st_size
+        self.rows: Optional[int] = None  # оценки, заполняет Plan.estimate()
+        self.seconds: Optional[float] = None
+
+    @property
+    def added(self) -> list[str]:
+        return [c for c in self.target if c not in self.header]
+
+    @property
+    def dropped(self) -> list[str]:
+        return [c for c in self.stepped if c not in self.target]
+
+    def convert(self, values: list[str], steps: list[Migration]) -> list[str]:
+        op = ""
+        if self.journal:
+            op, values = (values[0] if values else ""), values[1:]
+        row = dict(zip(self.header, values))
+        if op == "D":
+            return ["D", row.get("id") or ""]
+        for m in steps:
+            if m.row is not None:
+                row = m.row(row)
+        out = [row.get(c) or "" for c in self.target]
+        return [op] + out if self.journal else out
+
+    def _records(self, f, counter: Optional[list[int]] = None) -> Iterator[list[str]]:
+        lines = f
+        if counter is not None:
+            def lines_counted():
+                for line in iter(f.readline, ""):
+                    counter[0] += len(line.encode("utf-8"))
+                    yield line
+
+            lines = lines_counted()
+        reader = csv.reader(lines)
+        next(reader, None)  # старый заголовок
+        return reader
+
+    def estimate(self, steps: list[Migration]) -> None:
+        """Time the first ``SAMPLE_ROWS`` records and extrapolate by file size."""
+        consumed = [0]
+        n = 0
+        sink = csv.writer(io.StringIO())
+        started = time.perf_counter()
+        with self.path.open("r", encoding="utf-8", newline="") as f:
+            for values in self._records(f, consumed):
+                sink.writerow(self.convert(values, steps))
+                n += 1
+                if n >= SAMPLE_ROWS:
+                    break
+        elapsed = time.perf_counter() - started
+        scale = self.size / consumed[0] if consumed[0] else 0
+        self.rows = round(n * scale)
+        self.seconds = elapsed * scale
+
+    def rewrite(self, steps: list[Migration]) -> int:
+        # построчно во временный файл, затем replace: читатели видят
+        # либо старый файл, либо новый целиком
+        tmp = self.path.with_name(self.path.name + ".migrate")
+        n = 0
+        with self.path.open("r", encoding="utf-8", newline="") as src, \
+                tmp.open("w", encoding="utf-8", newline="") as dst:
+            w = csv.writer(dst)
+            w.writerow((["op"] if self.journal else []) + self.target)
+            for values in self._records(src):
+                w.writerow(self.convert(values, steps))
+                n += 1
+        tmp.replace(self.path)
+        return n
+
+
+class Plan:
+    """Pending steps and the files they touch; ``apply()`` runs it."""
+
+    def __init__(self, marker: Path, version: int, steps: list[Migration], files: list[FilePlan]):
+        self.marker = marker
+        self.version = version
+        self.steps = steps
+        self.files = files
+
+    @property
+    def target_version(self) -> int:
+        return max(self.version, latest())
+
+    @property
+    def pending(self) -> bool:
+        return bool(self.files) or self.version < self.target_version
+
+    def estimate(self) -> None:
+        for fp in self.files:
+            fp.estimate(self.steps)
+
+    def describe(self) -> list[str]:
+        lines = [f"schema version {self.version} -> {self.target_version}"]
+        lines += [f"  {m.version}: {m.description}" for m in self.steps]
+        for fp in self.files:
+            if fp.rows is None:
+                lines.append(f"{fp.path.name}: {_size(fp.size)}")
+            else:
+                lines.append(f"{fp.path.name}: {_size(fp.size)}, ~{fp.rows} rows, ~{fp.seconds:.1f}s")
+            lines += [f"  + {c}" for c in fp.added]
+            lines += [f"  - {c} (unknown, needs --drop-unknown)" for c in fp.dropped]
+            if not fp.added and not fp.dropped and fp.header != fp.target:
+                lines.append("  column order")
+        if not self.files:
+            lines.append("no files to rewrite")
+        return lines
+
+    def apply(self, drop_unknown: bool = False) -> int:
+        """Rewrite the files and bump the marker; returns the number of records written."""
+        if not drop_unknown:
+            for fp in self.files:
+                if fp.dropped:
+                    raise MigrationError(
+                        f"{fp.path.name}: unknown columns {', '.join(fp.dropped)} would be lost "
+                        "(run `flask --app app migrate --drop-unknown` to drop them)"
+                    )
+        n = sum(fp.rewrite(self.steps) for fp in self.files)
+        if self.version < self.target_version:
+            write_version(self.marker, self.target_version)
+        return n
+
+
+def plan(
+    path: Path,
+    columns: list[str],
+    marker: Path,
+    journal_path: Optional[Path] = None,
+    force: bool = False,
+) -> Plan:
+    """Work out what brings ``path`` (and the journal) to ``columns``.
+
+    ``force`` re-runs every step regardless of the marker (they are idempotent).
+    """
+    version = read_version(marker)
+    steps = [m for m in sorted(MIGRATIONS, key=lambda m: m.version) if force or m.version > version]
+    files: list[FilePlan] = []
+    for p, journal in ((path, False), (journal_path, True)):
+        if p is None:
+            continue
+        header = read_header(p)
+        if not header:
+            continue
+        if journal:
+            header = header[1:]
+        stepped = header
+        for m in steps:
+            stepped = m.header(stepped)
+        fp = FilePlan(p, header, stepped, list(columns), journal)
+        if header != fp.target or any(m.row is not None for m in steps):
+            files.append(fp)
+    return Plan(marker, version, steps, files)
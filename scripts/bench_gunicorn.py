@@ -0,0 +1,131 @@
+"""Throughput of gunicorn.conf.py under different worker settings.
+
+Seeds a throwaway DATA_DIR with ``--cards`` cards, then starts gunicorn once
+per configuration and hammers ``/`` and ``/api/listings`` from ``--clients``
+keep-alive connections for ``--seconds``. "dropped" counts keep-alive
+connections closed under the client (mostly max_requests recycling) and
+non-200 answers. Run from the project root:
+
+    python scripts/bench_gunicorn.py --cards 2000 --seconds 10
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CONFIGS = [
+    ("sync x1 (old default)", {"GUNICORN_WORKER_CLASS": "sync", "WEB_CONCURRENCY": "1", "GUNICORN_PRELOAD": "0"}),
+    ("sync x4", {"GUNICORN_WORKER_CLASS": "sync", "WEB_CONCURRENCY": "4"}),
+    ("gthread 2x4", {"GUNICORN_WORKER_CLASS": "gthread", "WEB_CONCURRENCY": "2", "GUNICORN_THREADS": "4"}),
+    ("gthread 4x4", {"GUNICORN_WORKER_CLASS": "gthread", "WEB_CONCURRENCY": "4", "GUNICORN_THREADS": "4"}),
+    ("gevent x4", {"GUNICORN_WORKER_CLASS": "gevent", "WEB_CONCURRENCY": "4"}),
+]
+
+
+def _seed(tmp: Path, cards: int) -> dict:
+    env = dict(os.environ, DATA_DIR=str(tmp / "data"), UPLOADS_DIR=str(tmp / "uploads"), SECRET_KEY="bench")
+    code = (
+        "import app\n"
+        f"for i in range({cards}):\n"
+        "    app._save_submission_row(sid=f'{i:010X}', created_utc=f'2026-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}+00:00',"
+        " kind='material', title=f'Карточка {i}', price_tenge=str(i), phone='', description='описание ' * 20,"
+        " photos=[], password='')\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True)
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_up(port: int, timeout: float = 20) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("gunicorn did not start")
+
+
+def _hammer(port: int, clients: int, seconds: float) -> tuple[int, int]:
+    done = [0, 0]
+    lock = threading.Lock()
+    stop = time.time() + seconds
+
+    def client(n: int) -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        ok = err = 0
+        paths = ("/", "/api/listings")
+        i = n
+        while time.time() < stop:
+            try:
+                conn.request("GET", paths[i % 2])
+                resp = conn.getresponse()
+                resp.read()
+                ok += resp.status == 200
+                err += resp.status != 200
+            except (OSError, http.client.HTTPException):
+                err += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            i += 1
+        with lock:
+            done[0] += ok
+            done[1] += err
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return done[0], done[1]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--cards", type=int, default=1000)
+    ap.add_argument("--clients", type=int, default=16)
+    ap.add_argument("--seconds", type=float, default=8)
+    args = ap.parse_args()
+
+    env = _seed(Path(tempfile.mkdtemp(prefix="nrkitap-gbench-")), args.cards)
+    print(f"{args.cards} cards, {args.clients} clients, {args.seconds:.0f}s per config")
+    print(f"{'config':<24} {'req/s':>8} {'dropped':>8}")
+    for name, extra in CONFIGS:
+        if extra.get("GUNICORN_WORKER_CLASS") == "gevent" and importlib.util.find_spec("gevent") is None:
+            print(f"{name:<24} {'skipped (gevent not installed)':>30}")
+            continue
+        port = _free_port()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+            cwd=ROOT, env=dict(env, PORT=str(port), **extra),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            _wait_up(port)
+            _hammer(port, args.clients, 1.0)  # прогрев
+            ok, err = _hammer(port, args.clients, args.seconds)
+            print(f"{name:<24} {ok / args.seconds:>8.0f} {err:>8}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Newest-K selection: full sort of card dicts vs bounded heap.
+
+"sort" is the old _load_submissions path: build a card dict for every row,
+sort all of them by created_utc, slice. "heap" is store.top_newest over
+lightweight key tuples, then card dicts only for the K survivors.
+
+    python scripts/bench_topk.py [--k 30] [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from store import top_newest  # noqa: E402
+
+
+def _rows(n: int) -> list[dict]:
+    rnd = random.Random(n)
+    return [
+        {
+            "id": f"{rnd.getrandbits(40):010X}",
+            "created_utc": f"2026-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T"
+                           f"{rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}:00+00:00",
+            "kind": "material",
+            "title": f"Материал {i}",
+            "price_tenge": str(rnd.randint(0, 20000)),
+            "phone": "",
+            "description": "описание " * 10,
+            "photos": "a.jpg;b.png",
+            "password": "",
+        }
+        for i in range(n)
+    ]
+
+
+def _card(r: dict) -> dict:
+    photos = [p for p in (r.get("photos") or "").split(";") if p]
+    return {
+        "id": (r.get("id") or "").strip(),
+        "created_utc": (r.get("created_utc") or "").strip(),
+        "kind": (r.get("kind") or "material").strip().lower(),
+        "title": (r.get("title") or "").strip(),
+        "price_tenge": (r.get("price_tenge") or "").strip(),
+        "phone": (r.get("phone") or "").strip(),
+        "description": (r.get("description") or "").strip(),
+        "photos": photos,
+        "password": (r.get("password") or "").strip(),
+    }
+
+
+def full_sort(rows: list[dict], k: int) -> list[dict]:
+    items = [_card(r) for r in rows]
+    items.sort(key=lambda x: x.get("created_utc", ""), reverse=True)
+    return items[:k]
+
+
+def heap(rows: list[dict], k: int) -> list[dict]:
+    return [_card(r) for r in top_newest(rows, k)]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--k", type=int, default=30)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    print(f"{'rows':>8} {'sort ms':>10} {'heap ms':>10} {'speedup':>8}")
+    for n in (1_000, 10_000, 100_000):
+        rows = _rows(n)
+        assert [c["created_utc"] for c in full_sort(rows, args.k)] == \
+               [c["created_utc"] for c in heap(rows, args.k)]
+        t_sort = min(timeit.repeat(lambda: full_sort(rows, args.k), number=1, repeat=args.repeat))
+        t_heap = min(timeit.repeat(lambda: heap(rows, args.k), number=1, repeat=args.repeat))
+        print(f"{n:>8} {t_sort * 1000:>10.2f} {t_heap * 1000:>10.2f} {t_sort / t_heap:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
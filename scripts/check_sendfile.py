@@ -0,0 +1,106 @@
+"""Check photo hand-off to the front proxy (SENDFILE_MODE=accel|sendfile).
+
+Stands in for nginx/Apache: requests photos through the Flask test client
+and checks the headers a proxy would act on. For every mode an open photo
+must come back with an empty body and ``X-Accel-Redirect`` under
+``ACCEL_PREFIX`` (or ``X-Sendfile`` with the file path); a locked card
+must get 403 and a missing or escaping file 404, both without the header.
+Run from the project root:
+
+    python scripts/check_sendfile.py
+"""
+from __future__ import annotations
+
+import io
+import os
+import sys
+import tempfile
+from pathlib import Path
+from urllib.parse import quote
+
+ROOT = Path(__file__).resolve().parent.parent
+JPEG = b"\xff\xd8\xff\xe0" + b"0" * 100
+
+failures: list[str] = []
+
+
+def check(cond: bool, what: str) -> None:
+    print(("ok   " if cond else "FAIL ") + what)
+    if not cond:
+        failures.append(what)
+
+
+def _latin1(value: str) -> bool:
+    try:
+        value.encode("latin-1")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def _create(client, title: str, password: str = "") -> str:
+    r = client.post(
+        "/admin/create",
+        data={"title": title, "password": password, "photos": [(io.BytesIO(JPEG), "a.jpg")]},
+        content_type="multipart/form-data",
+    )
+    return r.headers["Location"].rsplit("/", 1)[-1]
+
+
+def main() -> int:
+    tmp = Path(tempfile.mkdtemp(prefix="nrkitap-sendfile-"))
+    os.environ.update(
+        DATA_DIR=str(tmp / "data"), UPLOADS_DIR=str(tmp / "uploads"), ADMIN_KEY="k", SECRET_KEY="s",
+    )
+    sys.path.insert(0, str(ROOT))
+    import app as webapp
+
+    admin = webapp.app.test_client()
+    admin.post("/admin/login", data={"key": "k"})
+    open_sid = _create(admin, "open")
+    locked_sid = _create(admin, "locked", password="pw")
+    # имя, которое нужно экранировать в заголовке
+    odd = "фото 1.jpg"
+    (webapp.UPLOADS_DIR / open_sid / odd).write_bytes(JPEG)
+
+    for mode in ("accel", "sendfile"):
+        webapp.SENDFILE_MODE = mode
+        header = "X-Accel-Redirect" if mode == "accel" else "X-Sendfile"
+        client = webapp.app.test_client()  # без админской сессии
+        print(f"-- SENDFILE_MODE={mode}")
+
+        for name in ("a.jpg", odd):
+            r = client.get(f"/uploads/{open_sid}/{quote(name)}")
+            value = r.headers.get(header, "")
+            if mode == "accel":
+                want = webapp.ACCEL_PREFIX + quote(f"{open_sid}/{name}")
+            else:
+                # байты UTF-8 в latin-1 строке — так WSGI передаёт не-ASCII заголовки
+                want = str(webapp.UPLOADS_DIR / open_sid / name).encode("utf-8").decode("latin-1")
+            check(r.status_code == 200, f"{name}: 200 (got {r.status_code})")
+            check(value == want, f"{name}: {header} = {want} (got {value!r})")
+            check(_latin1(value), f"{name}: header is latin-1 (WSGI)")
+            check(r.get_data() == b"", f"{name}: empty body (got {len(r.get_data())} bytes)")
+            check(r.headers.get("Content-Type", "").startswith("image/jpeg"), f"{name}: image/jpeg")
+            if mode == "accel":
+                check(value.startswith(webapp.ACCEL_PREFIX), f"{name}: under ACCEL_PREFIX")
+
+        r = client.get(f"/uploads/{locked_sid}/a.jpg")
+        check(r.status_code == 403, f"locked card: 403 (got {r.status_code})")
+        check(header not in r.headers, f"locked card: no {header}")
+
+        client.post(f"/unlock/{locked_sid}", data={"password": "pw"})
+        r = client.get(f"/uploads/{locked_sid}/a.jpg")
+        check(r.status_code == 200 and header in r.headers, f"unlocked card: 200 with {header}")
+
+        for path in (f"/uploads/{open_sid}/missing.jpg", f"/uploads/{open_sid}/..%2F..%2Fdata%2Fsubmissions.csv"):
+            r = client.get(path)
+            check(r.status_code == 404, f"{path}: 404 (got {r.status_code})")
+            check(header not in r.headers, f"{path}: no {header}")
+
+    print(f"{len(failures)} failure(s)" if failures else "all checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
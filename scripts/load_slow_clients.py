@@ -0,0 +1,80 @@
+"""Listing latency while slow clients download a photo: sync vs ASGI.
+
+Opens ``--slow`` connections that read a large file at ``--rate`` KB/s each,
+then times ``--requests`` GETs of ``/`` alongside them. Under sync gunicorn
+workers, every slow download pins a worker. Under ``uvicorn asgi:app`` it
+only holds a coroutine. Compare the two deployments:
+
+    gunicorn app:app -w 2 -b 127.0.0.1:8001 &
+    uvicorn asgi:app --port 8002 &
+    python scripts/load_slow_clients.py http://127.0.0.1:8001 /uploads/<ID>/<file>
+    python scripts/load_slow_clients.py http://127.0.0.1:8002 /uploads/<ID>/<file>
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def _get(host: str, port: int, path: str, rate_kb: float = 0.0) -> tuple[int, int]:
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    size = 0
+    while True:
+        chunk = await reader.read(4096)
+        if not chunk:
+            break
+        size += len(chunk)
+        if rate_kb:
+            await asyncio.sleep(len(chunk) / 1024 / rate_kb)
+    writer.close()
+    return status, size
+
+
+async def _run(args) -> None:
+    url = urlsplit(args.base)
+    host, port = url.hostname, url.port or 80
+    slow = [asyncio.create_task(_get(host, port, args.file, args.rate)) for _ in range(args.slow)]
+    await asyncio.sleep(0.5)  # даём медленным клиентам занять воркеры
+
+    latencies, errors = [], 0
+    for _ in range(args.requests):
+        t = time.perf_counter()
+        try:
+            status, _ = await asyncio.wait_for(_get(host, port, "/"), args.timeout)
+            errors += status != 200
+        except (asyncio.TimeoutError, OSError):
+            errors += 1
+            latencies.append(args.timeout)
+            continue
+        latencies.append(time.perf_counter() - t)
+
+    for task in slow:
+        task.cancel()
+    await asyncio.gather(*slow, return_exceptions=True)
+
+    latencies.sort()
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{args.base}: {args.slow} slow downloads, {args.requests} listing requests")
+    print(f"  median {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, "
+          f"max {latencies[-1] * 1000:.1f} ms, errors/timeouts {errors}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("base", help="e.g. http://127.0.0.1:8001")
+    ap.add_argument("file", help="path of a large upload, e.g. /uploads/<ID>/<file>")
+    ap.add_argument("--slow", type=int, default=20)
+    ap.add_argument("--rate", type=float, default=32.0, help="KB/s per slow client")
+    ap.add_argument("--requests", type=int, default=50)
+    ap.add_argument("--timeout", type=float, default=10.0)
+    asyncio.run(_run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
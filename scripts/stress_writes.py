@@ -0,0 +1,78 @@
+"""Concurrent create/edit stress check for the storage layer.
+
+Spawns N worker processes against one DATA_DIR; each creates cards through
+the admin routes and edits them. Afterwards every card must exist with its
+last edit applied. Run from the project root:
+
+    python scripts/stress_writes.py --procs 8 --cards 40
+    CSV_JOURNAL=1 CSV_COMPACT_AT=25 python scripts/stress_writes.py
+    STORAGE_BACKEND=sqlite python scripts/stress_writes.py
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _worker(n: int, cards: int, queue) -> None:
+    sys.path.insert(0, str(ROOT))
+    import app as webapp
+
+    client = webapp.app.test_client()
+    client.post("/admin/login", data={"key": os.environ["ADMIN_KEY"]})
+    made = {}
+    for i in range(cards):
+        r = client.post("/admin/create", data={"title": f"p{n}-c{i}", "price": str(i)})
+        sid = r.headers["Location"].rsplit("/", 1)[-1]
+        made[sid] = f"p{n}-c{i}"
+        if i % 2:
+            title = f"p{n}-c{i}-edited"
+            client.post(f"/admin/save/{sid}", data={"title": title, "price_tenge": str(i)})
+            made[sid] = title
+    queue.put(made)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--procs", type=int, default=8)
+    ap.add_argument("--cards", type=int, default=40)
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="nrkitap-stress-"))
+    os.environ.update(
+        DATA_DIR=str(tmp / "data"),
+        UPLOADS_DIR=str(tmp / "uploads"),
+        ADMIN_KEY="stress",
+        SECRET_KEY="stress",
+    )
+
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(n, args.cards, queue)) for n in range(args.procs)]
+    for p in procs:
+        p.start()
+    expected: dict[str, str] = {}
+    for _ in procs:
+        expected.update(queue.get())
+    for p in procs:
+        p.join()
+
+    sys.path.insert(0, str(ROOT))
+    import app as webapp
+
+    rows = {r["id"]: r for r in webapp._read_all_rows()}
+    missing = sorted(set(expected) - set(rows))
+    stale = sorted(sid for sid, t in expected.items() if sid in rows and rows[sid]["title"] != t)
+    print(f"{len(expected)} cards written, {len(rows)} stored, "
+          f"{len(missing)} missing, {len(stale)} with lost edits ({tmp})")
+    return 1 if missing or stale or len(rows) != len(expected) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,817 @@
+from __future__ import annotations
+
+import bisect
+import csv
+import heapq
+import io
+import json
+import os
+import threading
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+from locks import FileLock
+
+
+class SchemaError(Exception):
+    """The file's header doesn't match the store's columns (run the migration)."""
+
+
+class SubmissionStore:
+    """Storage interface for cards.
+
+    Rows are plain dicts keyed by ``columns``. ``rows()`` and ``get()``
+    return copies; ``newest()`` may return the backend's own dicts.
+    """
+
+    columns: list[str]
+    # эксклюзивная блокировка писателей (CSV); у SQLite свои транзакции
+    lock = nullcontext()
+
+    @property
+    def version(self):
+        """Opaque token that changes whenever the data changes (cheap to get)."""
+        raise NotImplementedError
+
+    @property
+    def last_modified(self) -> Optional[float]:
+        """Epoch seconds of the last write, if known."""
+        return None
+
+    def refresh(self) -> None:
+        pass
+
+    def invalidate(self) -> None:
+        pass
+
+    def rows(self) -> list[dict]:
+        raise NotImplementedError
+
+    def iter_rows(self) -> Iterator[dict]:
+        """All rows in file order, one at a time (for streaming exports)."""
+        yield from self.rows()
+
+    @contextmanager
+    def snapshot(self) -> Iterator[Callable[[], Iterator[dict]]]:
+        """One fixed view for several passes: yields a function that re-iterates it."""
+        rows = self.rows()
+        yield lambda: iter(rows)
+
+    def get(self, sid: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def page(self, limit: int, after: Optional[tuple[str, str]] = None) -> list[dict]:
+        """Up to ``limit`` rows newest-first, strictly older than the
+        ``(created_utc, id)`` cursor ``after``."""
+        raise NotImplementedError
+
+    def newest(self, limit: int) -> list[dict]:
+        return self.page(limit)
+
+    def protected_ids(self) -> frozenset[str]:
+        """Ids of password-protected cards."""
+        return frozenset(
+            (r.get("id") or "").strip() for r in self.rows() if (r.get("password") or "").strip()
+        )
+
+    def append(self, row: dict) -> None:
+        raise NotImplementedError
+
+    def append_many(self, rows: Iterable[dict]) -> None:
+        """Add many new cards in one locked write (bulk import)."""
+        with self.lock:
+            for row in rows:
+                self.append(row)
+
+    def upsert(self, row: dict) -> None:
+        raise NotImplementedError
+
+    def delete(self, sid: str) -> None:
+        raise NotImplementedError
+
+    def rewrite(self, rows: Iterable[dict]) -> None:
+        raise NotImplementedError
+
+    def compact(self) -> None:
+        pass
+
+
+def open_store(backend: str, data_dir: Path, columns: list[str], **opts) -> SubmissionStore:
+    """Build the store selected by ``STORAGE_BACKEND`` ("csv" or "sqlite")."""
+    if backend == "sqlite":
+        from store_sqlite import SqliteStore
+
+        return SqliteStore(data_dir / "submissions.sqlite3", columns)
+    if backend != "csv":
+        raise ValueError(f"unknown storage backend: {backend!r}")
+    return CsvStore(data_dir / "submissions.csv", columns, **opts)
+
+
+class CsvStore(SubmissionStore):
+    """In-process view of ``submissions.csv``.
+
+    The file is parsed once and kept as an id -> row dict plus a
+    (created_utc, id)-sorted list. Every access does a cheap ``stat()``; if only
+    appends happened since the last load, just the new tail is parsed,
+    otherwise (rewrite / atomic replace) the file is reloaded from scratch.
+
+    Alongside the rows an id -> (start, end) byte-offset index is kept. With
+    ``sidecar=True`` it is also persisted next to the CSV, so a process that
+    hasn't loaded the rows (CLI, lookups before warm-up) can resolve a single
+    card by seeking instead of parsing the whole file. Only writers touch the
+    sidecar: appends add their offsets to it, rewrites build it anew.
+
+    With ``journal=True`` updates and deletes don't rewrite the CSV: they are
+    appended to ``submissions.journal`` as full rows ("U") or tombstones
+    ("D") and replayed on top of the main file, latest record wins. Once the
+    journal holds ``compact_at`` records it is folded back into the main file
+    in a background thread (same atomic ``tmp.replace()`` as before).
+
+    Writers hold ``lock`` (flock on ``submissions.lock``), so several
+    gunicorn workers can write safely; readers never block because the
+    main file is only ever appended to or atomically replaced.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        columns: list[str],
+        sidecar: bool = False,
+        journal: bool = False,
+        compact_at: int = 500,
+    ):
+        self.path = path
+        self.columns = list(columns)
+        self.sidecar_path = path.with_suffix(".idx") if sidecar else None
+        self.journal_path = path.with_suffix(".journal") if journal else None
+        self.compact_at = compact_at
+        self._lock = threading.RLock()
+        self.lock = FileLock(path.with_suffix(".lock"))
+        self._compacting = False
+        self._sig: Optional[tuple] = None  # (main stat, journal stat)
+        self._header: list[str] = []
+        self._offset = 0  # byte offset right after the last parsed record
+        self._jheader: list[str] = []
+        self._joffset = 0
+        self._jrecords = 0
+        self._rows: list[dict] = []  # file order
+        self._by_id: dict[str, dict] = {}
+        self._offsets: dict[str, tuple[int, int]] = {}
+        # (created_utc, id) ascending; строится лениво — первой странице
+        # хватает top-K по куче (_top), полная сортировка нужна только курсорам
+        self._order: Optional[list[dict]] = None
+        self._top: Optional[list[dict]] = None
+        self._protected: Optional[frozenset[str]] = None
+        # индекс из sidecar-файла (пока строки не загружены целиком)
+        self._idx_sig: Optional[tuple] = None
+        self._idx_header: list[str] = []
+        self._idx_offsets: dict[str, tuple[int, int]] = {}
+        self._pid = os.getpid()
+        self._fh = self._jfh = None
+        self._fkey: Optional[tuple] = None
+        self._jkey: Optional[tuple] = None
+        self._hkey: Optional[tuple] = None  # состояние файла с проверенным заголовком
+
+    # ---- loading ----
+
+    @staticmethod
+    def _file_sig(path: Optional[Path]) -> Optional[tuple]:
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _stat_sig(self) -> Optional[tuple]:
+        main = self._file_sig(self.path)
+        if main is None:
+            return None
+        return (main, self._file_sig(self.journal_path))
+
+    def _reset(self) -> None:
+        self._header = []
+        self._offset = 0
+        self._jheader = []
+        self._joffset = 0
+        self._jrecords = 0
+        self._rows = []
+        self._by_id = {}
+        self._offsets = {}
+        self._order = None
+        self._top = None
+        self._protected = None
+
+    def _iter_records(self, f, start: int) -> Iterator[tuple[int, int, list[str]]]:
+        """Yield (start, end, values) for every CSV record from byte offset ``start``."""
+        pos = start
+        torn = False
+        taken: list[str] = []  # строки текущей записи
+
+        def lines():
+            nonlocal pos, torn
+            for raw in iter(f.readline, b""):
+                if not raw.endswith(b"\n"):
+                    # последняя строка без \n: запись ещё дописывается, если
+                    # замок у писателя; иначе файл так и кончается (правили
+                    # руками) или писатель успел закончить — дочитываем его
+                    # хвост (новая запись сначала закрывает строку \n)
+                    torn = self.lock.busy()
+                    if torn:
+                        return
+                    raw += f.readline()
+                pos += len(raw)
+                line = raw.decode("utf-8")
+                taken.append(line)
+                yield line
+
+        # strict: незакрытая кавычка в конце файла — ошибка, а не готовое поле
+        # (запись оборвалась на \n внутри описания)
+        reader = csv.reader(lines(), strict=True)
+        while True:
+            rec_start = pos
+            taken.clear()
+            try:
+                values = next(reader)
+            except StopIteration:
+                return
+            except csv.Error:
+                if torn:
+                    return  # запись ещё дописывается, дочитаем в следующий раз
+                f.seek(pos)
+                if not f.read(1):
+                    # незакрытая кавычка в конце файла: оборвана, только пока
+                    # замок у писателя (или он успел дописать — тогда дочитаем)
+                    busy = self.lock.busy()
+                    f.seek(pos)
+                    if busy or f.read(1):
+                        return
+                f.seek(pos)
+                # кривая строка посреди файла (правили руками) — разбираем её
+                # как раньше, без strict, и идём дальше
+                for values in csv.reader(taken):
+                    yield rec_start, pos, values
+                continue
+            yield rec_start, pos, values
+
+    def _row_from(self, values: list[str], header: Optional[list[str]] = None) -> dict:
+        # как csv.DictReader: недостающие поля -> None
+        header = self._header if header is None else header
+        row = dict(zip(header, values))
+        for c in header[len(values):]:
+            row[c] = None
+        return row
+
+    def _add(self, row: dict, span: tuple[int, int]) -> bool:
+        sid = (row.get("id") or "").strip()
+        if not sid:
+            return False
+        self._rows.append(row)
+        self._by_id.setdefault(sid, row)
+        self._offsets.setdefault(sid, span)
+        return True
+
+    def _apply(self, values: list[str]) -> None:
+        """Replay one journal record on top of the loaded rows."""
+        self._jrecords += 1
+        op = values[0] if values else ""
+        row = self._row_from(values[1:], self._jheader[1:])
+        sid = (row.get("id") or "").strip()
+        if not sid:
+            return
+        old = self._by_id.get(sid)
+        if op == "D":
+            if old is not None:
+                _drop(self._rows, old)
+                if self._order is not None:
+                    _drop(self._order, old)
+                del self._by_id[sid]
+            return
+        if old is None:
+            self._rows.append(row)
+            self._by_id[sid] = row
+            self._insert_ordered(row)
+            return
+        # новый объект вместо правки на месте: page()/newest()/iter_rows()
+        # отдают внутренние dict без замка, их содержимое не должно меняться
+        _swap(self._rows, old, row)
+        self._by_id[sid] = row
+        if self._order is not None:
+            _drop(self._order, old)
+            self._insert_ordered(row)
+
+    def _open(self, path: Path):
+        """Open ``path`` and return (handle, inode key) or (None, None)."""
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None, None
+        st = os.fstat(f.fileno())
+        return f, (st.st_dev, st.st_ino)
+
+    def _close(self) -> None:
+        for f in (self._fh, self._jfh):
+            if f is not None:
+                f.close()
+        self._fh = self._jfh = None
+        self._fkey = self._jkey = None
+
+    def _reopen(self) -> None:
+        # свои дескрипторы тех же файлов: строки, разобранные до fork
+        # (gunicorn --preload), остаются, дочитываем только хвост
+        for attr, key_attr, path in (
+            ("_fh", "_fkey", self.path),
+            ("_jfh", "_jkey", self.journal_path),
+        ):
+            old = getattr(self, attr)
+            if old is None:
+                continue
+            # новый открываем до закрытия старого: inode не успеет освободиться
+            f, key = self._open(path)
+            old.close()
+            if f is not None and key != getattr(self, key_attr):
+                f.close()
+                f = key = None
+            setattr(self, attr, f)
+            setattr(self, key_attr, key)
+
+    def _load_main(self) -> list[dict]:
+        appended: list[dict] = []
+        f = self._fh
+        f.seek(self._offset)
+        for start, end, values in self._iter_records(f, self._offset):
+            self._offset = end
+            if not self._header:
+                self._header = values
+                continue
+            row = self._row_from(values)
+            if self._add(row, (start, end)):
+                appended.append(row)
+        return appended
+
+    def _load_journal(self) -> None:
+        f = self._jfh
+        f.seek(self._joffset)
+        for _, end, values in self._iter_records(f, self._joffset):
+            self._joffset = end
+            if not self._jheader:
+                self._jheader = values
+                continue
+            self._apply(values)
+
+    def _load(self, sig: tuple) -> None:
+        # Держим разобранные файлы открытыми: пока дескриптор жив, inode не
+        # может достаться новому файлу после tmp.replace(), так что совпадение
+        # inode надёжно означает «тот же файл, в него только дописывали».
+        main, jrnl = sig
+        if self._pid != os.getpid():
+            self._reopen()  # после fork позиция в дескрипторе общая с родителем
+            self._pid = os.getpid()
+        same_main = self._fh is not None and self._fkey == (main[0], main[1])
+        same_jrnl = (jrnl is None and self._jfh is None) or (
+            jrnl is not None
+            and (self._jfh is None and self._joffset == 0 or self._jkey == (jrnl[0], jrnl[1]))
+        )
+
+        if not (same_main and same_jrnl):
+            self._close()
+            self._reset()
+            # журнал открываем раньше основного файла: если между открытиями
+            # прошло сжатие, получим новый файл + старый журнал (повтор записей
+            # безопасен), а не старый файл без журнала
+            if self.journal_path is not None:
+                self._jfh, self._jkey = self._open(self.journal_path)
+            self._fh, self._fkey = self._open(self.path)
+            if self._fh is None:
+                self._close()
+                self._sig = None
+                return
+            self._load_main()
+            if self._jfh is not None:
+                self._load_journal()
+        else:
+            # обычно новые карточки самые свежие -> дописываем в хвост
+            for row in self._load_main():
+                self._insert_ordered(row)
+            if jrnl is not None:
+                if self._jfh is None:
+                    self._jfh, self._jkey = self._open(self.journal_path)
+                if self._jfh is not None:
+                    self._load_journal()
+        self._sig = sig
+        self._top = None
+        self._protected = None
+
+    def _insert_ordered(self, row: dict) -> None:
+        if self._order is not None:
+            bisect.insort(self._order, row, key=order_key)
+
+    # ---- sidecar offset index ----
+
+    # Формат: первая строка — JSON {"file": [st_dev, st_ino], "header": [...],
+    # "hend": конец заголовка}, дальше по строке "id\tstart\tend" на запись.
+    # Годен, пока inode тот же и записи покрывают файл до конца
+
+    def _index_write(self, key: tuple, header: list[str], hend: int, entries: list) -> None:
+        tmp = self.sidecar_path.with_name(f"{self.sidecar_path.name}.{os.getpid()}.tmp")
+        try:
+            with tmp.open("w", encoding="utf-8", newline="") as f:
+                f.write(json.dumps({"file": list(key), "header": header, "hend": hend}) + "\n")
+                f.writelines(_index_lines(entries))
+            tmp.replace(self.sidecar_path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+
+    def _index_append(self, key: tuple, entries: list) -> None:
+        # только к индексу этого же файла; иначе он устарел и ждёт перезаписи
+        try:
+            with self.sidecar_path.open("r+", encoding="utf-8", newline="") as f:
+                if json.loads(f.readline() or "null").get("file") != list(key):
+                    return
+                f.seek(0, os.SEEK_END)
+                f.writelines(_index_lines(entries))
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def _load_index(self, sig: tuple) -> bool:
+        """Use the sidecar index only if it covers exactly the file in ``sig``."""
+        key = (sig[0], sig[1], sig[3])
+        if self._idx_sig == key:
+            return True
+        try:
+            with self.sidecar_path.open("r", encoding="utf-8", newline="") as f:
+                meta = json.loads(f.readline())
+                if meta["file"] != [sig[0], sig[1]]:
+                    return False
+                offsets: dict[str, tuple[int, int]] = {}
+                covered = int(meta["hend"])
+                for line in f:
+                    sid, start, end = line.rstrip("\n").split("\t")
+                    offsets.setdefault(sid, (int(start), int(end)))
+                    covered = max(covered, int(end))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return False
+        if covered != sig[3]:
+            return False  # дописали без индекса (или он оборван)
+        self._idx_header = list(meta["header"])
+        self._idx_offsets = offsets
+        self._idx_sig = key
+        return True
+
+    def build_index(self) -> None:
+        """Write the sidecar from the loaded rows if it is missing or stale (warm-up)."""
+        if self.sidecar_path is None:
+            return
+        with self.lock, self._lock:
+            self.refresh()
+            sig = self._stat_sig()
+            if sig is None or self._fh is None or self._load_index(sig[0]):
+                return
+            if self._fkey != (sig[0][0], sig[0][1]) or self._offset != sig[0][3]:
+                return  # файл дописан не до конца — в другой раз
+            hend = min((start for start, _ in self._offsets.values()), default=self._offset)
+            entries = [(sid, start, end) for sid, (start, end) in self._offsets.items()]
+            self._index_write(self._fkey, self._header, hend, entries)
+
+    def _read_at(self, sid: str, sig: tuple):
+        """Read one record through the sidecar index; ``_MISS`` if the file moved on."""
+        span = self._idx_offsets.get(sid)
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return _MISS
+        with f:
+            st = os.fstat(f.fileno())
+            if (st.st_dev, st.st_ino, st.st_size) != (sig[0], sig[1], sig[3]):
+                return _MISS
+            if span is None:
+                return None
+            f.seek(span[0])
+            chunk = f.read(span[1] - span[0])
+        for values in csv.reader(chunk.decode("utf-8").splitlines(keepends=True)):
+            row = self._row_from(values, self._idx_header)
+            if (row.get("id") or "").strip() == sid:
+                return row
+        return _MISS
+
+    def refresh(self) -> None:
+        with self._lock:
+            sig = self._stat_sig()
+            if sig == self._sig:
+                return
+            if sig is None:
+                self._close()
+                self._reset()
+                self._sig = None
+                return
+            self._load(sig)
+
+    def invalidate(self) -> None:
+        """Force a full reload on next access (call after rewriting the file)."""
+        with self._lock:
+            self._sig = None
+            self._close()
+            self._reset()
+
+    # ---- queries ----
+
+    @property
+    def version(self) -> Optional[tuple]:
+        # только stat(), без разбора файла
+        return self._stat_sig()
+
+    @property
+    def last_modified(self) -> Optional[float]:
+        sig = self._stat_sig()
+        if sig is None:
+            return None
+        return max(s[2] for s in sig if s is not None) / 1e9
+
+    def rows(self) -> list[dict]:
+        """All rows in file order (shallow copies, safe to mutate)."""
+        with self._lock:
+            self.refresh()
+            return [dict(r) for r in self._rows]
+
+    def iter_rows(self) -> Iterator[dict]:
+        with self._lock:
+            self.refresh()
+            snapshot = list(self._rows)  # только ссылки, копии — по одной
+        for r in snapshot:
+            yield dict(r)
+
+    @contextmanager
+    def snapshot(self) -> Iterator[Callable[[], Iterator[dict]]]:
+        with self._lock:
+            self.refresh()
+            rows = list(self._rows)  # строки не меняются на месте, хватает ссылок
+        yield lambda: (dict(r) for r in rows)
+
+    def get(self, sid: str) -> Optional[dict]:
+        """One row by id (a copy), resolved through the offset index."""
+        with self._lock:
+            sig = self._stat_sig()
+            if sig is None:
+                return None
+            if (
+                self._sig is None
+                and self.sidecar_path is not None
+                and sig[1] is None
+                and self._load_index(sig[0])
+            ):
+                row = self._read_at(sid, sig[0])
+                if row is not _MISS:
+                    return row
+            self.refresh()
+            r = self._by_id.get(sid)
+            return dict(r) if r is not None else None
+
+    def page(self, limit: int, after: Optional[tuple[str, str]] = None) -> list[dict]:
+        """Rows newest-first (internal dicts, do not mutate)."""
+        with self._lock:
+            self.refresh()
+            if limit <= 0:
+                return []
+            if after is None and self._order is None:
+                # первая страница: O(N log K) куча вместо полной сортировки,
+                # результат держим до следующего изменения данных
+                if self._top is None or len(self._top) < min(limit, len(self._rows)):
+                    self._top = top_newest(self._rows, limit)
+                return self._top[:limit]
+            if self._order is None:
+                self._order = sorted(self._rows, key=order_key)
+            end = len(self._order)
+            if after is not None:
+                end = bisect.bisect_left(self._order, tuple(after), key=order_key)
+            return self._order[max(0, end - limit):end][::-1]
+
+    def protected_ids(self) -> frozenset[str]:
+        with self._lock:
+            self.refresh()
+            if self._protected is None:
+                self._protected = frozenset(
+                    sid for sid, r in self._by_id.items() if (r.get("password") or "").strip()
+                )
+            return self._protected
+
+    # ---- writes ----
+
+    def _check_header(self, exact: bool = False) -> None:
+        """Refuse writes that would misplace or drop the file's columns.
+
+        Rewrites go by column name, so only unknown columns matter there;
+        appends also need the same order. Checked once per file state: the
+        key includes mtime and size, so a copy written over the same inode is
+        caught too; our own appends carry the key forward.
+        """
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return
+        if not st.st_size or _header_key(st, exact) == self._hkey:
+            return
+        with self.path.open("r", encoding="utf-8", newline="") as f:
+            header = next(csv.reader(f), [])
+        unknown = [c for c in header if c not in self.columns]
+        if unknown:
+            raise SchemaError(f"{self.path.name}: unknown columns {', '.join(unknown)}; run the schema migration")
+        if exact and header != self.columns:
+            raise SchemaError(f"{self.path.name}: header differs from the schema; run the schema migration")
+        self._hkey = _header_key(st, exact)
+
+    def _values(self, row: dict) -> list[str]:
+        return [(row.get(c, "") or "") for c in self.columns]
+
+    @staticmethod
+    def _append_record(path: Path, header: list[str], values: list[str]) -> None:
+        fresh = not path.exists() or path.stat().st_size == 0
+        with path.open("a", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            if fresh:
+                w.writerow(header)
+            elif not _ends_with_newline(path):
+                f.write("\n")
+            w.writerow(values)
+
+    @staticmethod
+    def _encode(values: list[str]) -> bytes:
+        buf = io.StringIO()
+        csv.writer(buf).writerow(values)
+        return buf.getvalue().encode("utf-8")
+
+    def append(self, row: dict) -> None:
+        """Add a new card at the end of the main CSV."""
+        self.append_many([row])
+
+    def append_many(self, rows: Iterable[dict]) -> None:
+        # одной записью: читатели увидят либо все строки, либо ни одной целой
+        with self.lock:
+            self._check_header(exact=True)
+            try:
+                size = self.path.stat().st_size
+            except FileNotFoundError:
+                size = 0
+            if size == 0:
+                out = bytearray(self._encode(self.columns))
+            else:
+                # последняя строка без \n (правили руками) — сначала закрываем её
+                out = bytearray(b"" if _ends_with_newline(self.path) else b"\n")
+            hend = len(out)
+            entries = []
+            for r in rows:
+                start = size + len(out)
+                out += self._encode(self._values(r))
+                entries.append(((r.get("id") or "").strip(), start, size + len(out)))
+            with self.path.open("ab") as f:
+                f.write(out)
+                f.flush()
+                st = os.fstat(f.fileno())
+                key = (st.st_dev, st.st_ino)
+            # заголовок только что проверен, а дописали мы сами
+            self._hkey = _header_key(st, True)
+            if self.sidecar_path is not None:
+                if size == 0:
+                    self._index_write(key, self.columns, hend, entries)
+                else:
+                    self._index_append(key, entries)
+
+    def upsert(self, row: dict) -> None:
+        """Replace the card with the same id (or add it)."""
+        sid = (row.get("id") or "").strip()
+        with self.lock:
+            self._check_header()
+            if self.journal_path is not None:
+                self._append_record(self.journal_path, ["op"] + self.columns, ["U"] + self._values(row))
+            else:
+                rows = self.rows()
+                for i, r in enumerate(rows):
+                    if (r.get("id") or "").strip() == sid:
+                        rows[i] = row
+                        break
+                else:
+                    rows.append(row)
+                self._rewrite(rows)
+        self._maybe_compact()
+
+    def delete(self, sid: str) -> None:
+        with self.lock:
+            self._check_header()
+            if self.journal_path is not None:
+                self._append_record(self.journal_path, ["op"] + self.columns, ["D", sid])
+            else:
+                rows = [r for r in self.rows() if (r.get("id") or "").strip() != sid]
+                self._rewrite(rows)
+        self._maybe_compact()
+
+    def rewrite(self, rows: Iterable[dict]) -> None:
+        """Replace the whole data set (atomic)."""
+        with self.lock:
+            self._rewrite(rows)
+
+    def _rewrite(self, rows: Iterable[dict]) -> None:
+        self._check_header()
+        # атомарная запись
+        tmp = self.path.with_suffix(".tmp")
+        entries = []
+        with tmp.open("wb") as f:
+            f.write(self._encode(self.columns))
+            hend = pos = f.tell()
+            for r in rows:
+                rec = self._encode(self._values(r))
+                f.write(rec)
+                if self.sidecar_path is not None:
+                    entries.append(((r.get("id") or "").strip(), pos, pos + len(rec)))
+                pos += len(rec)
+            key = _inode(f)
+        tmp.replace(self.path)
+        if self.sidecar_path is not None:
+            self._index_write(key, self.columns, hend, entries)
+        # журнал уже учтён в rows; повторное чтение старого журнала
+        # до удаления безопасно — записи идемпотентны
+        if self.journal_path is not None:
+            self.journal_path.unlink(missing_ok=True)
+        self.invalidate()
+
+    def compact(self) -> None:
+        """Fold the journal back into the main CSV."""
+        with self.lock:
+            self.refresh()
+            if self._jrecords:
+                self._rewrite(self.rows())
+
+    def _maybe_compact(self) -> None:
+        if self.journal_path is None or self.compact_at <= 0:
+            return
+        self.refresh()
+        with self._lock:
+            if self._jrecords < self.compact_at or self._compacting:
+                return
+            self._compacting = True
+        threading.Thread(target=self._compact_bg, name="csv-compact", daemon=True).start()
+
+    def _compact_bg(self) -> None:
+        try:
+            self.compact()
+        except SchemaError:
+            pass  # журнал подождёт миграции
+        finally:
+            self._compacting = False
+
+
+_MISS = object()
+
+
+def _inode(f) -> tuple[int, int]:
+    st = os.fstat(f.fileno())
+    return (st.st_dev, st.st_ino)
+
+
+def _header_key(st: os.stat_result, exact: bool) -> tuple:
+    return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size, exact)
+
+
+def _ends_with_newline(path: Path) -> bool:
+    with path.open("rb") as f:
+        f.seek(0, os.SEEK_END)
+        if not f.tell():
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def _index_lines(entries: Iterable[tuple[str, int, int]]) -> Iterator[str]:
+    for sid, start, end in entries:
+        if sid and "\t" not in sid and "\n" not in sid:
+            yield f"{sid}\t{start}\t{end}\n"
+
+
+def top_newest(rows: Iterable[dict], k: int) -> list[dict]:
+    """The ``k`` newest rows, newest first, via a bounded heap.
+
+    The heap holds only ``(created_utc, id, n)`` tuples; ``n`` breaks ties
+    so rows themselves are never compared.
+    """
+    rows = list(rows)
+    keys = ((*order_key(r), n) for n, r in enumerate(rows))
+    return [rows[n] for _, _, n in heapq.nlargest(k, keys)]
+
+
+def order_key(row: dict) -> tuple[str, str]:
+    """Listing order: created_utc is ISO, so lexicographic order is time order."""
+    return ((row.get("created_utc") or "").strip(), (row.get("id") or "").strip())
+
+
+def _swap(items: list, old, new) -> None:
+    for i, x in enumerate(items):
+        if x is old:
+            items[i] = new
+            return
+
+
+def _drop(items: list, obj) -> None:
+    for i, x in enumerate(items):
+        if x is obj:
+            del items[i]
+            return
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import csv
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+from store import SubmissionStore
+
+
+class SqliteStore(SubmissionStore):
+    """Cards in an SQLite database (WAL mode).
+
+    Every column is TEXT; ``seq`` keeps insertion order so ``rows()`` matches
+    the CSV backend. ``meta.version`` is bumped inside each write transaction
+    and serves as the data version for caches.
+    """
+
+    def __init__(self, path: Path, columns: list[str]):
+        self.path = path
+        self.columns = list(columns)
+        self._local = threading.local()
+        self._protected: tuple[int, frozenset[str]] = (-1, frozenset())
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        # одно соединение на поток; после fork (gunicorn --preload) — новое
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self) -> None:
+        cols = ", ".join(f'"{c}" TEXT NOT NULL DEFAULT \'\'' for c in self.columns if c != "id")
+        conn = self._conn()
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS submissions (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                "id" TEXT NOT NULL,
+                {cols}
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS submissions_id ON submissions("id");
+            CREATE INDEX IF NOT EXISTS submissions_created ON submissions(created_utc, "id");
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO meta(key, value) VALUES ('version', 0);
+        """)
+
+    def _select(self) -> str:
+        return "SELECT " + ", ".join(f'"{c}"' for c in self.columns) + " FROM submissions"
+
+    def _to_row(self, values: tuple) -> dict:
+        return dict(zip(self.columns, values))
+
+    def _values(self, row: dict) -> list[str]:
+        return [(row.get(c, "") or "") for c in self.columns]
+
+    def _write(self, fn) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            fn(conn)
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # ---- queries ----
+
+    @property
+    def version(self) -> int:
+        return self._conn().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    @property
+    def last_modified(self) -> Optional[float]:
+        mtimes = []
+        for p in (self.path, self.path.with_name(self.path.name + "-wal")):
+            try:
+                mtimes.append(os.stat(p).st_mtime)
+            except FileNotFoundError:
+                pass
+        return max(mtimes) if mtimes else None
+
+    def rows(self) -> list[dict]:
+        cur = self._conn().execute(self._select() + " ORDER BY seq")
+        return [self._to_row(v) for v in cur]
+
+    def iter_rows(self) -> Iterator[dict]:
+        # своё соединение: генератор может дочитываться из другого потока
+        # (ASGI-мост), а снимок WAL держится до конца чтения
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        try:
+            cur = conn.execute(self._select() + " ORDER BY seq")
+            while batch := cur.fetchmany(500):
+                for v in batch:
+                    yield self._to_row(v)
+        finally:
+            conn.close()
+
+    @contextmanager
+    def snapshot(self) -> Iterator[Callable[[], Iterator[dict]]]:
+        # одна читающая транзакция: все проходы видят один и тот же снимок WAL
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        try:
+            conn.execute("BEGIN")
+            # снимок фиксируется первым чтением, а не первым проходом
+            conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+
+            def rows() -> Iterator[dict]:
+                cur = conn.execute(self._select() + " ORDER BY seq")
+                while batch := cur.fetchmany(500):
+                    for v in batch:
+                        yield self._to_row(v)
+
+            yield rows
+        finally:
+            conn.close()
+
+    def get(self, sid: str) -> Optional[dict]:
+        v = self._conn().execute(self._select() + ' WHERE "id" = ?', (sid,)).fetchone()
+        return self._to_row(v) if v is not None else None
+
+    def page(self, limit: int, after: Optional[tuple[str, str]] = None) -> list[dict]:
+        if limit <= 0:
+            return []
+        sql, args = self._select(), []
+        if after is not None:
+            sql += ' WHERE (created_utc, "id") < (?, ?)'
+            args += list(after)
+        sql += ' ORDER BY created_utc DESC, "id" DESC LIMIT ?'
+        cur = self._conn().execute(sql, args + [limit])
+        return [self._to_row(v) for v in cur]
+
+    def protected_ids(self) -> frozenset[str]:
+        version, ids = self._protected
+        current = self.version
+        if version != current:
+            cur = self._conn().execute("SELECT \"id\" FROM submissions WHERE password != ''")
+            ids = frozenset(v[0] for v in cur)
+            self._protected = (current, ids)
+        return ids
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+
+    # ---- writes ----
+
+    def _insert_sql(self, upsert: bool) -> str:
+        names = ", ".join(f'"{c}"' for c in self.columns)
+        marks = ", ".join("?" for _ in self.columns)
+        sql = f"INSERT INTO submissions ({names}) VALUES ({marks})"
+        if upsert:
+            sets = ", ".join(f'"{c}" = excluded."{c}"' for c in self.columns if c != "id")
+            sql += f' ON CONFLICT("id") DO UPDATE SET {sets}'
+        return sql
+
+    def append(self, row: dict) -> None:
+        self._write(lambda c: c.execute(self._insert_sql(False), self._values(row)))
+
+    def append_many(self, rows: Iterable[dict]) -> None:
+        self._write(lambda c: c.executemany(self._insert_sql(False), (self._values(r) for r in rows)))
+
+    def upsert(self, row: dict) -> None:
+        self._write(lambda c: c.execute(self._insert_sql(True), self._values(row)))
+
+    def delete(self, sid: str) -> None:
+        self._write(lambda c: c.execute('DELETE FROM submissions WHERE "id" = ?', (sid,)))
+
+    def rewrite(self, rows: Iterable[dict]) -> None:
+        def fn(c: sqlite3.Connection) -> None:
+            c.execute("DELETE FROM submissions")
+            c.executemany(self._insert_sql(True), (self._values(r) for r in rows))
+
+        self._write(fn)
+
+
+def import_csv(csv_path: Path, store: SqliteStore) -> int:
+    """One-shot copy of ``submissions.csv`` into ``store``; returns row count."""
+    rows: list[dict] = []
+    with csv_path.open("r", encoding="utf-8", newline="") as f:
+        for r in csv.DictReader(f):
+            if (r.get("id") or "").strip():
+                rows.append(r)
+    store.rewrite(rows)
+    return len(rows)
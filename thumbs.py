@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterator
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # без Pillow превью не строятся, отдаются оригиналы
+    Image = None
+
+# Производные картинки: UPLOADS_DIR/<sid>/_thumbs/<size>/<filename>.webp
+THUMBS_DIR = "_thumbs"
+SIZES = (220, 800)
+IMAGE_EXT = {"jpg", "jpeg", "png", "webp", "gif"}
+
+AVAILABLE = Image is not None
+
+# mkstemp создаёт файлы 0600 — превью должен читать и фронт-прокси (SENDFILE_MODE)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def is_image(filename: str) -> bool:
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    return ext in IMAGE_EXT
+
+
+def thumb_name(filename: str) -> str:
+    return f"{filename}.webp"
+
+
+def thumb_path(card_dir: Path, filename: str, size: int) -> Path:
+    return card_dir / THUMBS_DIR / str(size) / thumb_name(filename)
+
+
+def make_thumb(src: Path, dst: Path, size: int) -> bool:
+    """Write a ``size``-px (longest side) WebP of ``src`` to ``dst``."""
+    if Image is None:
+        return False
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    # уникальное имя: одно и то же превью могут строить несколько потоков сразу
+    fd, name = tempfile.mkstemp(dir=dst.parent, prefix=f".{dst.name}.", suffix=".tmp")
+    os.close(fd)
+    tmp = Path(name)
+    try:
+        with Image.open(src) as im:
+            im = ImageOps.exif_transpose(im)
+            im.thumbnail((size, size))
+            if im.mode not in ("RGB", "RGBA"):
+                im = im.convert("RGBA" if "transparency" in im.info else "RGB")
+            im.save(tmp, "WEBP", quality=80, method=4)
+        os.chmod(tmp, 0o666 & ~_UMASK)
+        tmp.replace(dst)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        tmp.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def make_thumbs(card_dir: Path, filename: str, force: bool = False) -> int:
+    """Build every size for one photo; returns how many were written."""
+    if Image is None or not is_image(filename):
+        return 0
+    src = card_dir / filename
+    made = 0
+    for size in SIZES:
+        dst = thumb_path(card_dir, filename, size)
+        if not force and dst.exists():
+            continue
+        if make_thumb(src, dst, size):
+            made += 1
+    return made
+
+
+def drop_thumbs(card_dir: Path, filename: str) -> None:
+    for size in SIZES:
+        thumb_path(card_dir, filename, size).unlink(missing_ok=True)
+
+
+def iter_photos(uploads_dir: Path) -> Iterator[tuple[Path, str]]:
+    """(card_dir, filename) for every image under ``uploads_dir``."""
+    for card_dir in sorted(uploads_dir.iterdir()):
+        if not card_dir.is_dir() or card_dir.name.startswith((".", "_")):
+            continue
+        for p in sorted(card_dir.iterdir()):
+            if p.is_file() and is_image(p.name):
+                yield card_dir, p.name
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import IO, Optional
+
+from flask import current_app
+from flask.wrappers import Request
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.formparser import default_stream_factory
+
+# Недокачанные файлы: UPLOADS_DIR/_incoming/*.part, после проверки — rename в карточку
+STAGING_DIR = "_incoming"
+
+# сигнатуры первых байт для картинок; остальные материалы не проверяем
+_MAGIC = {
+    "jpg": (b"\xff\xd8\xff",),
+    "jpeg": (b"\xff\xd8\xff",),
+    "png": (b"\x89PNG\r\n\x1a\n",),
+    "gif": (b"GIF87a", b"GIF89a"),
+    "webp": (b"RIFF",),
+}
+_HEAD = 12
+
+# mkstemp создаёт 0600, а фото отдаёт и фронт-прокси под своим пользователем
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _ext(filename: Optional[str]) -> str:
+    return filename.rsplit(".", 1)[-1].lower() if filename and "." in filename else ""
+
+
+def sniff_ok(ext: str, head: bytes) -> bool:
+    """Do the first bytes of a file match what its extension promises?"""
+    sigs = _MAGIC.get(ext)
+    if sigs is None:
+        return True
+    if ext == "webp":
+        return head[:4] == b"RIFF" and head[8:12] == b"WEBP"
+    return head.startswith(sigs)
+
+
+class StagedFile:
+    """Upload body written straight into the staging dir as it is parsed.
+
+    Enforces the per-file size cap and the magic-byte check while the
+    multipart parser writes chunks; ``commit`` renames the file into place,
+    ``close`` without a commit removes it.
+    """
+
+    def __init__(self, staging_dir: Path, filename: Optional[str], max_bytes: Optional[int]):
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(dir=staging_dir, suffix=".part")
+        self.path: Optional[Path] = Path(name)
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self._ext = _ext(filename)
+        self._f = os.fdopen(fd, "w+b")
+        self._size = 0
+        self._head: Optional[bytes] = b"" if self._ext in _MAGIC else None
+
+    def write(self, data: bytes) -> int:
+        self._size += len(data)
+        if self.max_bytes is not None and self._size > self.max_bytes:
+            raise RequestEntityTooLarge(f"{self.filename}: файл больше {self.max_bytes // (1024 * 1024)} МБ")
+        if self._head is not None:
+            self._head += data[:_HEAD - len(self._head)]
+            if len(self._head) >= _HEAD:
+                self._check_head()
+        return self._f.write(data)
+
+    def _check_head(self) -> None:
+        head, self._head = self._head, None
+        if not sniff_ok(self._ext, head or b""):
+            raise UnsupportedMediaType(f"{self.filename}: содержимое не похоже на .{self._ext}")
+
+    def commit(self, target: Path) -> None:
+        if self._head is not None:  # файл короче сигнатуры
+            self._check_head()
+        self._f.close()
+        os.chmod(self.path, 0o666 & ~_UMASK)
+        os.replace(self.path, target)
+        self.path = None
+
+    def close(self) -> None:
+        self._f.close()
+        if self.path is not None:
+            self.path.unlink(missing_ok=True)
+            self.path = None
+
+    def __getattr__(self, name: str):
+        # read/seek/readline/... — от настоящего файла
+        return getattr(self._f, name)
+
+
+class StagingRequest(Request):
+    """Request whose file uploads stream into ``UPLOAD_STAGING_DIR``.
+
+    Without that config key it falls back to Werkzeug's spooled temp files.
+    ``MAX_FILE_SIZE`` (bytes) caps each file part. ``UPLOAD_LIMITS`` maps an
+    endpoint to its own ``(whole request, one file)`` caps in bytes.
+    """
+
+    def _limits(self) -> tuple[Optional[int], Optional[int]]:
+        cfg = current_app.config
+        default = (cfg.get("MAX_CONTENT_LENGTH"), cfg.get("MAX_FILE_SIZE"))
+        return cfg.get("UPLOAD_LIMITS", {}).get(self.endpoint, default)
+
+    @property
+    def max_content_length(self) -> Optional[int]:  # type: ignore[override]
+        return self._limits()[0]
+
+    def _get_file_stream(
+        self,
+        total_content_length: Optional[int],
+        content_type: Optional[str],
+        filename: Optional[str] = None,
+        content_length: Optional[int] = None,
+    ) -> IO[bytes]:
+        staging = current_app.config.get("UPLOAD_STAGING_DIR")
+        if staging is None:
+            return default_stream_factory(
+                total_content_length=total_content_length,
+                filename=filename,
+                content_type=content_type,
+                content_length=content_length,
+            )
+        staged = StagedFile(Path(staging), filename, self._limits()[1])
+        self.__dict__.setdefault("_staged", []).append(staged)
+        return staged  # type: ignore[return-value]
+
+    def close(self) -> None:
+        super().close()
+        # в т.ч. части, брошенные парсером на 413/415
+        for staged in self.__dict__.pop("_staged", ()):
+            staged.close()
+
+
+def save_upload(storage, target: Path) -> None:
+    """``FileStorage.save`` that renames a staged body instead of copying it."""
+    stream = storage.stream
+    if isinstance(stream, StagedFile) and stream.path is not None:
+        stream.commit(target)
+    else:
+        storage.save(target)
+
+
+def sweep_staging(staging_dir: Path, max_age: float = 3600) -> int:
+    """Remove ``.part`` files left behind by killed workers."""
+    removed = 0
+    cutoff = time.time() - max_age
+    for p in staging_dir.glob("*.part"):
+        try:
+            if p.stat().st_mtime < cutoff:
+                p.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed